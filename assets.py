@@ -0,0 +1,209 @@
+import json
+import os
+import struct
+import zlib
+from collections import OrderedDict
+
+import pygame
+
+# pygame 2.1.3 より前は tostring / fromstring という名前だった
+_tobytes = getattr(pygame.image, "tobytes", None) or pygame.image.tostring
+_frombytes = getattr(pygame.image, "frombytes", None) or pygame.image.fromstring
+
+# アトラス1枚の大きさの上限（RGBA で 4MB）
+ATLAS_MAX_SIZE = (1024, 1024)
+
+# フォントは作るのが重いので、サイズごとに1つだけ作って使い回す
+_fonts = {}
+
+
+def get_font(size, name=None):
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(name, size)
+    return font
+
+
+def tint(image, color):
+    """image に color を掛け合わせた（BLEND_MULT）コピーを作る"""
+    tinted = image.copy()
+    overlay = pygame.Surface(image.get_size())
+    overlay.fill(color)
+    tinted.blit(overlay, (0, 0), special_flags=pygame.BLEND_MULT)
+    return tinted
+
+
+class SpriteAtlas:
+    """いくつもの画像を1枚の Surface に詰めたもの（テクスチャアトラス）
+
+    rects に (名前, 色違いの色 or None) から切り出す範囲を持ち、blit() はその
+    範囲だけを描く。画像ごとに Surface を持つより小さく済み、描く時はいつも
+    同じ1枚から読むことになる。
+    """
+
+    def __init__(self, surface, rects):
+        self.surface = surface
+        self.rects = rects  # (名前, 色 or None) -> Rect
+
+    def blit(self, target, name, pos, color=None):
+        """target の pos に name の画像を描いて、描いた範囲を返す"""
+        return target.blit(self.surface, pos, self.rects[name, color])
+
+    def image(self, name, color=None):
+        """切り出した画像（アトラスとピクセルを共有する subsurface）"""
+        return self.surface.subsurface(self.rects[name, color])
+
+    @classmethod
+    def pack(cls, images, max_size=ATLAS_MAX_SIZE):
+        """{(名前, 色): Surface} を背の高い順に棚へ並べて1枚にする"""
+        max_w, max_h = max_size
+        rects, x, y, shelf, width = {}, 0, 0, 0, 0
+        for key in sorted(images, key=lambda k: (-images[k].get_height(), str(k))):
+            w, h = images[key].get_size()
+            if x + w > max_w:  # 棚がいっぱいなので次の棚へ
+                x, y, shelf = 0, y + shelf, 0
+            if w > max_w or y + h > max_h:
+                raise ValueError(f"画像がアトラス（{max_w}x{max_h}）に収まりません")
+            rects[key] = pygame.Rect(x, y, w, h)
+            x += w
+            shelf, width = max(shelf, h), max(width, x)
+        surface = pygame.Surface((width, y + shelf), pygame.SRCALPHA)
+        for key, rect in rects.items():
+            # 透明な所に足すので、半透明のピクセルもそのままの値で写る
+            surface.blit(images[key], rect, special_flags=pygame.BLEND_RGBA_ADD)
+        return cls(surface, rects)
+
+
+class TextCache:
+    """描画済みの文字列を (文字列, 色) ごとに覚えておく（LRUで古いものから捨てる）
+
+    HPのように値が変わる文字列でも、同じ値なら前に作った Surface を返すので
+    毎フレーム font.render() しなくてよい。
+    """
+
+    def __init__(self, font, maxsize=128):
+        self.font = font
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def render(self, text, color, antialias=True):
+        key = (text, color, antialias)
+        surface = self._cache.get(key)
+        if surface is not None:
+            self._cache.move_to_end(key)
+            return surface
+        surface = self._cache[key] = self.font.render(text, antialias, color)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return surface
+
+
+class AssetManager:
+    """画像を1回だけ読み込み、画面のピクセル形式に変換して使い回す
+
+    リサイズ済みの画像は CELL_SIZE ごとのキャッシュファイルに生のピクセル列
+    （zlib 圧縮）で保存する。2回目以降の起動では JPEG/PNG のデコードと
+    リサイズをせずに済む。元の画像が更新されたらそのエントリだけ作り直す。
+    """
+
+    MAGIC = b"MZAC1"
+
+    def __init__(self, cell_size, cache_dir=".asset_cache"):
+        self.path = os.path.join(cache_dir, f"assets_{cell_size}.bin")
+        self.images = {}  # (ファイル名, サイズ) -> 変換済み Surface
+        self._disk = self._read_cache()  # キー -> (情報, ピクセル列)
+        self._dirty = False
+
+    def _read_cache(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return {}
+        if not data.startswith(self.MAGIC):
+            return {}
+        (index_len,) = struct.unpack_from("<I", data, len(self.MAGIC))
+        start = len(self.MAGIC) + 4
+        index = json.loads(data[start:start + index_len])
+        body = start + index_len
+        return {key: (info, data[body + info["offset"]:body + info["offset"] + info["length"]])
+                for key, info in index.items()}
+
+    def save(self):
+        """新しく作った画像があればキャッシュファイルを書き直す"""
+        if not self._dirty:
+            return
+        index, blobs, offset = {}, [], 0
+        for key, (info, blob) in self._disk.items():
+            index[key] = {**info, "offset": offset, "length": len(blob)}
+            blobs.append(blob)
+            offset += len(blob)
+        header = json.dumps(index).encode()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.MAGIC + struct.pack("<I", len(header)) + header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def image(self, path, size, alpha=True):
+        """path の画像を size にリサイズし、画面の形式に変換したものを返す"""
+        key = (path, tuple(size))
+        surface = self.images.get(key)
+        if surface is not None:
+            return surface
+        mode = "RGBA" if alpha else "RGB"
+        stamp = _stamp(path)
+        disk_key = f"{path}@{size[0]}x{size[1]}:{mode}"
+        cached = self._disk.get(disk_key)
+        if cached is not None and cached[0]["mtime"] == stamp["mtime"] and cached[0]["bytes"] == stamp["bytes"]:
+            surface = _frombytes(zlib.decompress(cached[1]), tuple(size), mode)
+        else:
+            surface = pygame.transform.scale(pygame.image.load(path), size)
+            pixels = _tobytes(surface, mode)
+            self._disk[disk_key] = (stamp, zlib.compress(pixels, 1))
+            self._dirty = True
+        # 画面と同じ形式にしておくと blit の時に変換が要らない
+        surface = surface.convert_alpha() if alpha else surface.convert()
+        self.images[key] = surface
+        return surface
+
+    def atlas(self, name, sprites, tints=None, max_size=ATLAS_MAX_SIZE):
+        """sprites（名前 -> (ファイル名, サイズ)）を1枚に詰めた SpriteAtlas を返す
+
+        tints に 名前 -> 色のリスト を渡すと、その色を掛けた色違いも一緒に詰める。
+        詰めたアトラスは切り出し範囲ごとキャッシュファイルに入れるので、次の
+        起動では元の画像を1枚も読まずに済む（元の画像か指定が変われば作り直す）。
+        """
+        tints = tints or {}
+        spec = json.loads(json.dumps({"sprites": sprites, "tints": tints}))  # タプルをリストにそろえて比べる
+        sources = {path: _stamp(path) for path, _ in sprites.values()}
+        disk_key = f"atlas:{name}"
+        cached = self._disk.get(disk_key)
+        if cached is not None and cached[0]["spec"] == spec and cached[0]["sources"] == sources:
+            info, blob = cached
+            surface = _frombytes(zlib.decompress(blob), tuple(info["size"]), "RGBA")
+            rects = {(key, tuple(color) if color else None): pygame.Rect(rect) for key, color, rect in info["rects"]}
+            atlas = SpriteAtlas(surface, rects)
+        else:
+            images = {}
+            for key, (path, size) in sprites.items():
+                image = images[key, None] = pygame.transform.scale(pygame.image.load(path), size)
+                for color in tints.get(key, ()):
+                    images[key, tuple(color)] = tint(image, color)
+            atlas = SpriteAtlas.pack(images, max_size)
+            info = {"spec": spec, "sources": sources, "size": list(atlas.surface.get_size()),
+                    "rects": [[key, color, list(rect)] for (key, color), rect in atlas.rects.items()]}
+            self._disk[disk_key] = (info, zlib.compress(_tobytes(atlas.surface, "RGBA"), 1))
+            self._dirty = True
+        atlas.surface = atlas.surface.convert_alpha()
+        return atlas
+
+
+def _stamp(path):
+    """元の画像が変わったかどうかを見分けるための情報"""
+    stat = os.stat(path)
+    return {"mtime": stat.st_mtime_ns, "bytes": stat.st_size}
@@ -0,0 +1,157 @@
+"""ゲームバランス調整用のバッチシミュレーター
+
+パラメータの組み合わせごとにシード付きのゲームを画面なしで大量に回し、
+クリア率・ゴールまでの時間・受けたダメージを CSV にまとめる。
+
+    python balance.py --games 200 --num-mobs 5,10,20 --mob-speed 1,2,3 --out balance.csv
+
+--corpus に置き場所を渡すと、迷路は毎回作らずに保存済みのファイル（なければ
+最初に作って保存する）を読み込んで使う。迷路は GameState が同じシードで作るもの
+と同じなので、--corpus の有無で結果は変わらない。
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from bot import SolverBot, move_towards, player_cell
+from game_state import DOWN, LEFT, RIGHT, UP, GameState, maze_seed, run_headless
+from maze_gen import ALGORITHMS, difficulty_score, generate_maze
+from savegame import load_maze, save_maze
+
+# kokaton2.py と同じ盤面
+ROWS, COLS, CELL_SIZE = 15, 20, 50
+MAX_TICKS = 60 * 60  # 1ゲームの上限（60FPSで1分）
+
+# 調整するパラメータと、指定がない時の値（GameState の引数名）
+DEFAULTS = {
+    "damage_wall_rate": 0.2,
+    "num_mobs": 10,
+    "mob_speed": 2,
+    "num_items": 5,
+    "player_speed": 4,
+    "hunter_ratio": 0.0,
+}
+
+
+def path_agent(state):
+    """ゴールへの一本道をたどるエージェントを作る（経路は state.paths から引く）"""
+    gx, gy = state.maze.goal
+    goal = gy * state.cols + gx
+
+    def agent(state):
+        here = player_cell(state)
+        step = state.paths.next_step(here, goal)
+        return 0 if step is None else move_towards(state, here, step)
+
+    return agent
+
+
+def random_agent(state):
+    """ランダムに歩き回るエージェント（比較用）"""
+    rng = random.Random(state.rng.random())
+    keys = [UP, DOWN, LEFT, RIGHT]
+    return lambda state: rng.choice(keys)
+
+
+AGENTS = {
+    "path": path_agent,
+    "random": random_agent,
+    "bot": lambda state: SolverBot(),  # アイテムに寄り道し、MOBを避ける
+}
+
+
+def build_corpus(directory, seeds, algorithm="backtracker"):
+    """シードごとの迷路ファイルを用意してパスのリストを返す（作ってあるものは作り直さない）
+
+    迷路は GameState(seed=seed, algorithm=algorithm) が作るものと同じにする。
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for seed in seeds:
+        path = os.path.join(directory, f"{ROWS}x{COLS}_{algorithm}_{seed}.maze")
+        if not os.path.exists(path):
+            save_maze(generate_maze(ROWS, COLS, seed=maze_seed(seed), algorithm=algorithm), path)
+        paths.append(path)
+    return paths
+
+
+def play_one(task):
+    """1ゲームを最後まで回して結果を返す（ワーカープロセスで実行される）"""
+    params, seed, agent_name, algorithm, maze_path = task
+    maze = load_maze(maze_path) if maze_path else None
+    state = GameState(ROWS, COLS, CELL_SIZE, seed=seed, algorithm=algorithm, maze=maze, **params)
+    run_headless(state, AGENTS[agent_name](state), MAX_TICKS)
+    return {
+        "clear": state.result == "clear",
+        "ticks": state.tick,
+        "damage": state.damage_taken,
+        "difficulty": difficulty_score(state.maze),
+    }
+
+
+def sweep(grid, games, agent="path", workers=None, base_seed=0, corpus=None, algorithm="backtracker"):
+    """grid の全組み合わせについて games 回ずつ回し、組み合わせごとに集計する"""
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    seeds = range(base_seed, base_seed + games)
+    mazes = build_corpus(corpus, seeds, algorithm) if corpus else [None] * games
+    tasks = [({**DEFAULTS, **combo}, seeds[g], agent, algorithm, mazes[g]) for combo in combos for g in range(games)]
+    workers = workers or os.cpu_count()
+    # 1タスクは軽いので、まとめて渡してプロセス間通信の回数を減らす
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(play_one, tasks, chunksize=chunksize))
+
+    rows = []
+    for i, combo in enumerate(combos):
+        chunk = results[i * games:(i + 1) * games]
+        clears = [r for r in chunk if r["clear"]]
+        rows.append({
+            **{**DEFAULTS, **combo},
+            "games": games,
+            "clear_rate": len(clears) / games,
+            "mean_ticks_to_goal": sum(r["ticks"] for r in clears) / len(clears) if clears else "",
+            "mean_damage": sum(r["damage"] for r in chunk) / games,
+            "mean_difficulty": sum(r["difficulty"] for r in chunk) / games,
+        })
+    return rows
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _values(text, cast):
+    return [cast(v) for v in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ゲームバランスのパラメータスイープ")
+    parser.add_argument("--games", type=int, default=100, help="組み合わせごとのゲーム数")
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="path")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時はCPU数）")
+    parser.add_argument("--seed", type=int, default=0, help="最初のシード")
+    parser.add_argument("--out", default="balance.csv")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="backtracker", help="迷路の作り方")
+    parser.add_argument("--corpus", default=None, help="保存済みの迷路を使う（なければ作る）ディレクトリ")
+    for name, default in DEFAULTS.items():
+        cast = type(default)
+        parser.add_argument("--" + name.replace("_", "-"), type=lambda t, c=cast: _values(t, c),
+                            default=[default], help=f"カンマ区切り（既定 {default}）")
+    args = parser.parse_args(argv)
+
+    grid = {name: getattr(args, name) for name in DEFAULTS}
+    rows = sweep(grid, args.games, args.agent, args.workers, args.seed, args.corpus, args.algorithm)
+    write_csv(rows, args.out)
+    for row in rows:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
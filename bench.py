@@ -0,0 +1,176 @@
+"""迷路生成・当たり判定・MOB移動・描画のベンチマーク
+
+シードを固定して同じ入力で計測し、結果を JSON で書き出す。保存しておいた
+ベースラインと比べて、遅くなったケースがあれば終了コード 1 で終わる。
+
+    python bench.py --save-baseline bench_baseline.json   # 基準を作る
+    python bench.py --baseline bench_baseline.json        # 比べる
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from game_state import GameState
+from maze_gen import distance_field, find_furthest_point, generate_maze
+
+SEED = 12345
+CELL_SIZE = 50
+MAZE_SIZES = [(15, 20), (61, 81), (201, 201), (501, 501)]
+MOB_COUNTS = [10, 100, 500]
+QUICK_MAZE_SIZES = [(15, 20), (61, 81)]
+QUICK_MOB_COUNTS = [10, 100]
+
+
+def measure(fn, repeat=5, number=1):
+    """fn を number 回呼ぶのを repeat 回繰り返し、1回あたりの秒数を返す"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {"min": min(times), "median": statistics.median(times)}
+
+
+def bench_generation(rows, cols, repeat):
+    results = {}
+    results["generate_maze"] = measure(lambda: generate_maze(rows, cols, seed=SEED), repeat)
+    maze = generate_maze(rows, cols, seed=SEED)
+    results["distance_field"] = measure(lambda: distance_field(maze, 1, 1), repeat)
+    results["find_furthest_point"] = measure(lambda: find_furthest_point(maze, 1, 1), repeat)
+    return results
+
+
+def bench_state(rows, cols, num_mobs, repeat):
+    state = GameState(rows, cols, CELL_SIZE, seed=SEED, num_mobs=num_mobs)
+    results = {}
+    results["generate_items"] = measure(lambda: state.generate_items(5), repeat, 20)
+
+    # 迷路のどこかにあるプレイヤーサイズの Rect で壁判定
+    rng = random.Random(SEED)
+    w, h = state.bounds.size
+    size = state.player_size
+    rects = [pygame.Rect(rng.randrange(w - size), rng.randrange(h - size), size, size) for _ in range(1000)]
+    collider = state.collider
+    results["hits_wall_x1000"] = measure(lambda: [collider.hits_wall(r) for r in rects], repeat)
+    results["hits_damage_x1000"] = measure(lambda: [collider.hits_damage(r) for r in rects], repeat)
+
+    def move_all():
+        for mob in state.mobs:
+            mob.move(collider, state.rng, state.bounds)
+    results["mob_move_all"] = measure(move_all, repeat, 20)
+    return results
+
+
+def bench_swarm(rows, cols, num_mobs, repeat):
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return {}
+    state = GameState(rows, cols, CELL_SIZE, seed=SEED, num_mobs=num_mobs, vectorized_mobs=True)
+    return {"swarm_move_all": measure(lambda: state.mobs.move(state.collider, state.bounds), repeat, 20)}
+
+
+def bench_draw(rows, cols, repeat):
+    import kokaton2
+    from camera import Camera
+
+    pygame.init()
+    kokaton2.SCREEN = pygame.display.set_mode((kokaton2.WIDTH, kokaton2.HEIGHT))
+    state = GameState(rows, cols, kokaton2.CELL_SIZE, seed=SEED)
+    kokaton2.load_images(state.player_size)
+    camera = Camera(kokaton2.WIDTH, kokaton2.HEIGHT, state.bounds.width, state.bounds.height)
+    camera.follow(state.bounds.centerx, state.bounds.centery)
+
+    def cold():
+        kokaton2.build_static_layer(state)
+        kokaton2.draw_maze(camera)
+
+    results = {"draw_maze_cold": measure(cold, repeat)}
+    results["draw_maze"] = measure(lambda: kokaton2.draw_maze(camera), repeat, 50)
+    return results
+
+
+def run(quick=False, repeat=5):
+    sizes = QUICK_MAZE_SIZES if quick else MAZE_SIZES
+    mob_counts = QUICK_MOB_COUNTS if quick else MOB_COUNTS
+    cases = {}
+    for rows, cols in sizes:
+        for name, value in bench_generation(rows, cols, repeat).items():
+            cases[f"{name}[{rows}x{cols}]"] = value
+        for name, value in bench_draw(rows, cols, repeat).items():
+            cases[f"{name}[{rows}x{cols}]"] = value
+        for num_mobs in mob_counts:
+            results = bench_state(rows, cols, num_mobs, repeat)
+            results.update(bench_swarm(rows, cols, num_mobs, repeat))
+            for name, value in results.items():
+                cases[f"{name}[{rows}x{cols},mobs={num_mobs}]"] = value
+    return {
+        "seed": SEED,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "cases": cases,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """ベースラインより tolerance 以上遅くなったケースを返す（最小値で比べる）"""
+    regressions = []
+    for name, value in current["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        ratio = value["min"] / base["min"] if base["min"] else 1.0
+        print(f"{name:<48} {base['min'] * 1000:10.3f} ms -> {value['min'] * 1000:10.3f} ms  x{ratio:.2f}")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="めいろとんのベンチマーク")
+    parser.add_argument("--quick", action="store_true", help="小さいサイズだけ計測する")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="比べるベースラインの JSON")
+    parser.add_argument("--save-baseline", help="結果をベースラインとしてここにも保存する")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="許容する遅くなり方（0.2 = 20%%）")
+    args = parser.parse_args(argv)
+    # kokaton2 を import すると作業ディレクトリが変わるので先に絶対パスにしておく
+    for name in ("out", "baseline", "save_baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    results = run(args.quick, args.repeat)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("遅くなったケース:", ", ".join(regressions))
+            return 1
+    else:
+        for name, value in results["cases"].items():
+            print(f"{name:<48} {value['min'] * 1000:10.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
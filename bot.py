@@ -0,0 +1,253 @@
+"""自動で迷路を解くボット
+
+ボットはメインループが pygame.key.get_pressed() から作るのと同じ入力
+ビットマスクを返すので、人の代わりにそのまま GameState.step() に渡せる。
+kokaton2.py の自動プレイ（Bキー）、soak.py の耐久テスト、balance.py の
+エージェントで使う。
+"""
+from game_state import DOWN, LEFT, RIGHT, UP
+from maze_gen import WALL
+
+DETOUR_STEPS = 20  # アイテムを取るために増やしてよい歩数
+DANGER_STEPS = 1  # この歩数以内にMOBがいる方へは進まない（向かってくるMOBはこの2倍）
+PATIENCE = 3 * 60  # MOBをよけてこれだけ待ったら武器を取りに行く（ティック）
+
+
+def player_cell(state):
+    """プレイヤーの中心があるセルの番号（y * cols + x）"""
+    half, cs = state.player_size // 2, state.cell_size
+    return (state.player_y + half) // cs * state.cols + (state.player_x + half) // cs
+
+
+def move_towards(state, here, cell):
+    """セル here にいるプレイヤーを隣のセル cell へ動かす入力
+
+    曲がる前に今のセルの行（列）の中へ収めるので、壁（ダメージ壁）には触れない。
+    """
+    cs, cols, size = state.cell_size, state.cols, state.player_size
+    px, py = state.player_x, state.player_y
+    cx, cy = here % cols, here // cols
+    delta = cell - here
+    if delta in (1, -1):
+        if not (cy * cs <= py and py + size <= (cy + 1) * cs):
+            # 横に進む前に行の中へ収める
+            return DOWN if py < cy * cs + (cs - size) // 2 else UP
+        return RIGHT if delta == 1 else LEFT
+    if not (cx * cs <= px and px + size <= (cx + 1) * cs):
+        # 縦に進む前に列の中へ収める
+        return RIGHT if px < cx * cs + (cs - size) // 2 else LEFT
+    return DOWN if delta == cols else UP
+
+
+class SolverBot:
+    """ゴールを目指して自動で遊ぶボット（GameState 用。果てのない迷路では何もしない）
+
+    state.paths の最短経路をたどり、DETOUR_STEPS 歩以内の寄り道で取れる
+    アイテムがあれば先に取りに行く。近くのMOBの方へは進まず、向かってくる
+    MOBからは脇道か先の長い方へ逃げる。同じ通路をまっすぐ来るMOBとは横に
+    ずれてすれ違う（武器か無敵アイテムがあれば気にせず進む）。
+    目標に近づけないまま PATIENCE ティックよけ続けたら、武器か無敵アイテムを
+    取りに行く。
+    bot(state) を毎ティック呼ぶ。違う state が来たら（次の面）目標を選び直す。
+    """
+
+    def __init__(self, detour_steps=DETOUR_STEPS, danger_steps=DANGER_STEPS, patience=PATIENCE):
+        self.detour_steps = detour_steps
+        self.danger_steps = danger_steps
+        self.patience = patience
+        self.state = None
+        self.cell = None  # 目標を選んだ時にいたセル
+        self.item = None  # 取りに行くアイテム（None ならゴールへ）
+        self.rescue = False  # item が待ちきれずに選んだ武器・無敵アイテムなら True（取るまで変えない）
+        self.best = None  # 今の目標に一番近づいた時の歩数
+        self.waited = 0  # 最後に目標へ近づいてから、MOBをよけていたティック数
+
+    def __call__(self, state):
+        if state.goal is None:
+            return 0  # 果てのない迷路にはたどる道がない
+        here = player_cell(state)
+        if state is not self.state:
+            self.state, self.cell, self.item, self.rescue, self.best, self.waited = state, None, None, False, None, 0
+        if self.item is not None and self.item not in state.items:
+            self.cell, self.rescue = None, False  # 取ったので選び直す
+        if here != self.cell and not self.rescue:
+            # セルを移った時だけ選び直す
+            self.cell = here
+            self.set_item(self.choose_item(state, here))
+        target = self.target_cell(state)
+        step = state.paths.next_step(here, target)
+        if step is None:
+            return 0
+        distance = state.paths.distance(here, target)
+        if self.best is None or distance < self.best:
+            self.best, self.waited = distance, 0
+        if state.weapon_timer <= 0 and not state.invincible_item:
+            blocked, chasing, dodges = self.threats(state, here)
+            if step in dodges and step not in blocked:
+                return dodges[step]  # 横にずれてすれ違う
+            if step in blocked:
+                self.waited += 1
+                if self.waited > self.patience:
+                    weapon = self.choose_weapon(state, here)
+                    if weapon is not None:
+                        self.set_item(weapon)
+                        self.rescue = True
+                if not chasing:
+                    return 0  # 向かってこないMOBが離れるのを待つ
+                return self.retreat(state, here, blocked, chasing, dodges)
+        return move_towards(state, here, step)
+
+    def set_item(self, item):
+        if item is not self.item:
+            self.item, self.best, self.waited = item, None, 0
+
+    def target_cell(self, state):
+        if self.item is not None:
+            return item_cell(state, self.item)
+        gx, gy = state.maze.goal
+        return gy * state.cols + gx
+
+    def choose_item(self, state, here):
+        """寄り道の歩数が detour_steps 以内で一番少ないアイテム（なければ None）"""
+        paths = state.paths
+        gx, gy = state.maze.goal
+        goal = gy * state.cols + gx
+        direct = paths.distance(here, goal)
+        best, best_key = None, (self.detour_steps + 1, 0)
+        for item in state.items:
+            cell = item_cell(state, item)
+            to_item = paths.distance(here, cell)
+            key = (to_item + paths.distance(cell, goal) - direct, to_item)
+            if key < best_key:
+                best, best_key = item, key
+        return best
+
+    def choose_weapon(self, state, here):
+        """一番近い武器か無敵アイテム（なければ None）"""
+        paths = state.paths
+        items = [item for item in state.items if item.type in ("weapon", "invincible")]
+        return min(items, key=lambda item: paths.distance(here, item_cell(state, item)), default=None)
+
+    def threats(self, state, here):
+        """近くのMOBを調べて (進まない隣のセル, 向かってくるMOBの向き, すれ違うための入力) を返す
+
+        danger_steps 歩以内のMOBと、こちらへ向かってくる（か止まっていてどちらへ
+        動くかわからない）2 * danger_steps 歩以内のMOBを危ないとみなす。同じセルに
+        いるMOBは、MOBのいる側の隣のセルをふさぐ。向きはセル番号の差（±1, ±cols）。
+        同じ通路をまっすぐ行き来するMOBは、横にずれればすれ違えるので、ふさぐ
+        代わりにずれる入力を {隣のセル: 入力} で返す（もうずれていれば気にしない）。
+        """
+        cs, cols = state.cell_size, state.cols
+        half = state.player_size // 2
+        px, py = state.player_x + half, state.player_y + half
+        reach = (2 * self.danger_steps + 1) * cs
+        near, lanes = [], {}
+        for mob in state.mobs:
+            rect = mob.rect
+            if abs(rect.centerx - px) + abs(rect.centery - py) > reach:
+                continue
+            mx, my = rect.x - mob.prev[0], rect.y - mob.prev[1]  # このティックに動いた向き
+            motion = (mx > 0) - (mx < 0) + ((my > 0) - (my < 0)) * cols
+            near.append((rect, mx, my, motion, mob.hunter))
+            center = rect.centery // cs * cols + rect.centerx // cs
+            if not mob.hunter and center != here and motion and _in_line(state, here, center, motion):
+                vertical = motion not in (1, -1)
+                span = (rect.left, rect.right) if vertical else (rect.top, rect.bottom)
+                lanes.setdefault((state.paths.next_step(here, center), vertical), []).append((span, len(near) - 1))
+
+        dodges = {}
+        for (toward, vertical), members in lanes.items():
+            lane = side_step(state, here, [span for span, _ in members], vertical)
+            if lane is not None:
+                for _, i in members:
+                    near[i] = None  # すれ違えるので、ふさがない
+                if lane:
+                    dodges[toward] = lane
+
+        blocked, chasing = set(), set()
+        for rect, mx, my, motion, hunter in filter(None, near):
+            for cell in state.collider.cells(rect):
+                if cell is None:
+                    continue
+                if cell == here:
+                    dx, dy = rect.centerx - px, rect.centery - py
+                    toward = here + ((dx > 0) - (dx < 0) if abs(dx) >= abs(dy) else ((dy > 0) - (dy < 0)) * cols)
+                    closing = hunter or mx * dx + my * dy <= 0
+                else:
+                    distance = state.paths.distance(here, cell)
+                    toward = state.paths.next_step(here, cell)
+                    closing = hunter or motion in (0, state.paths.next_step(cell, here) - cell)
+                    if distance > (2 * self.danger_steps if closing else self.danger_steps):
+                        continue
+                blocked.add(toward)
+                if closing:
+                    chasing.add(motion)
+        return blocked, chasing, dodges
+
+    def retreat(self, state, here, blocked, chasing, dodges):
+        """向かってくるMOBから離れる入力（逃げ場がなければ 0）
+
+        MOBがそのまま進んでも入ってこない脇道を選び、なければ行き止まりまで
+        遠い方へ下がる。すれ違えるMOBがいる方へは、先に横にずれる。
+        """
+        best, best_key = None, None
+        for n in self.neighbours(state, here):
+            if n in blocked:
+                continue
+            key = (n - here not in chasing, self.room(state, here, n, 2 * self.danger_steps + 2))
+            if best_key is None or key > best_key:
+                best, best_key = n, key
+        if best is None:
+            return 0
+        return dodges.get(best) or move_towards(state, here, best)
+
+    def room(self, state, here, cell, limit):
+        """here から cell へ進んだ先に、here を通らずに何歩まで行けるか（limit まで）"""
+        depth, frontier, seen = 0, [cell], {here, cell}
+        while frontier and depth < limit:
+            nxt = [n for c in frontier for n in self.neighbours(state, c) if n not in seen]
+            if not nxt:
+                break
+            seen.update(nxt)
+            frontier, depth = nxt, depth + 1
+        return depth
+
+    def neighbours(self, state, here):
+        cells, cols = state.maze.cells, state.cols
+        return [n for n in (here - cols, here + cols, here - 1, here + 1) if cells[n] != WALL]
+
+
+def side_step(state, here, spans, vertical):
+    """here の列（vertical でなければ行）をまっすぐ進むMOBたちとすれ違うための入力
+
+    spans は各MOBが横切らない方向に占める範囲 (始まり, 終わり)。どのMOBとも
+    重ならない位置にいれば 0、セルからはみ出さずにそこへずれられなければ None。
+    """
+    cs, size, speed, cols = state.cell_size, state.player_size, state.player_speed, state.cols
+    if vertical:
+        p, lo, minus, plus = state.player_x, here % cols * cs, LEFT, RIGHT
+    else:
+        p, lo, minus, plus = state.player_y, here // cols * cs, UP, DOWN
+    hi = lo + cs - size
+    if not lo <= p <= hi:
+        return None  # 曲がっている途中
+    # 速さ刻みでしか動けないので、セルに収まる位置を近い順に試す
+    for k in sorted(range((lo - p) // speed, (hi - p) // speed + 1), key=abs):
+        q = p + k * speed
+        if lo <= q and all(q >= m1 or q + size <= m0 for m0, m1 in spans):
+            return 0 if k == 0 else plus if k > 0 else minus
+    return None
+
+
+def _in_line(state, here, cell, motion):
+    """cell のMOBが here と同じ行（列）の通路を、その向きに沿って動いているか"""
+    cols = state.cols
+    if motion in (1, -1):
+        straight = cell // cols == here // cols and abs(cell - here)
+    else:
+        straight = cell % cols == here % cols and abs(cell - here) // cols
+    return bool(straight) and state.paths.distance(here, cell) == straight
+
+
+def item_cell(state, item):
+    return item.rect.y // state.cell_size * state.cols + item.rect.x // state.cell_size
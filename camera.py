@@ -0,0 +1,44 @@
+import pygame
+
+
+class Camera:
+    """プレイヤーを追いかけて、迷路のうち画面に映る範囲を決める
+
+    rect はワールド（迷路）座標で見た画面の範囲。迷路が画面より小さい時は
+    原点に固定するので、これまでと同じ見た目になる。ワールドの大きさを
+    省略すると果てのない迷路として、どこまでもついていく。
+    """
+
+    def __init__(self, width, height, world_width=None, world_height=None):
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.world = None if world_width is None else pygame.Rect(0, 0, world_width, world_height)
+
+    def follow(self, x, y):
+        """(x, y) が画面の中央に来るように動かす（迷路の外は映さない）"""
+        self.rect.center = (x, y)
+        if self.world is None:
+            return
+        if self.world.width <= self.rect.width:
+            self.rect.x = 0
+        else:
+            self.rect.x = max(0, min(self.rect.x, self.world.width - self.rect.width))
+        if self.world.height <= self.rect.height:
+            self.rect.y = 0
+        else:
+            self.rect.y = max(0, min(self.rect.y, self.world.height - self.rect.height))
+
+    def to_screen(self, pos):
+        """ワールド座標を画面座標にする"""
+        return pos[0] - self.rect.x, pos[1] - self.rect.y
+
+    def visible_cells(self, cell_size):
+        """画面に映るセルの範囲 (x0, y0, x1, y1)。x1, y1 は含まない"""
+        if self.world is None:
+            return (self.rect.left // cell_size, self.rect.top // cell_size,
+                    (self.rect.right - 1) // cell_size + 1, (self.rect.bottom - 1) // cell_size + 1)
+        cols, rows = -(-self.world.width // cell_size), -(-self.world.height // cell_size)
+        x0 = max(0, self.rect.left // cell_size)
+        y0 = max(0, self.rect.top // cell_size)
+        x1 = min(cols, (self.rect.right - 1) // cell_size + 1)
+        y1 = min(rows, (self.rect.bottom - 1) // cell_size + 1)
+        return x0, y0, x1, y1
@@ -0,0 +1,73 @@
+from tile_map import TILE_DAMAGE, TILE_ITEM, TILE_WALL
+
+
+class GridCollider:
+    """タイルマップを使った当たり判定
+
+    Rect が重なっているセルだけを調べるので、壁の数やMOBの数が増えても
+    1回の判定コストはほぼ一定になる。壁やダメージ壁の状態は TileMap の
+    フラグだけを見る。
+    """
+
+    def __init__(self, tile_map):
+        self.tile_map = tile_map
+        self.tiles = tile_map.tiles
+        self.rows = tile_map.rows
+        self.cols = tile_map.cols
+        self.cell_size = tile_map.cell_size
+        self.items = {}  # セル番号 -> そのセルにあるアイテムのリスト
+
+    def index_at(self, px, py):
+        """ピクセル座標が含まれるセルの番号"""
+        return (py // self.cell_size) * self.cols + px // self.cell_size
+
+    def cells(self, rect):
+        """rect が重なっているセル番号を返す（画面外のセルは None）"""
+        if rect.width <= 0 or rect.height <= 0:
+            return
+        cs = self.cell_size
+        x0, x1 = rect.left // cs, (rect.right - 1) // cs
+        y0, y1 = rect.top // cs, (rect.bottom - 1) // cs
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                if 0 <= cx < self.cols and 0 <= cy < self.rows:
+                    yield cy * self.cols + cx
+                else:
+                    yield None
+
+    def hits_wall(self, rect):
+        """rect が壁（または迷路の外）に重なっているか"""
+        tiles = self.tiles
+        return any(i is None or tiles[i] & TILE_WALL for i in self.cells(rect))
+
+    def hits_damage(self, rect):
+        """rect がダメージ壁に重なっているか"""
+        tiles = self.tiles
+        return any(i is not None and tiles[i] & TILE_DAMAGE for i in self.cells(rect))
+
+    # アイテムはセル単位で登録しておき、拾う判定も重なるセルだけ見る
+    def add_item(self, item):
+        index = self.index_at(item.rect.x, item.rect.y)
+        self.items.setdefault(index, []).append(item)
+        self.tile_map.set(index, TILE_ITEM)
+
+    def remove_item(self, item):
+        index = self.index_at(item.rect.x, item.rect.y)
+        bucket = self.items.get(index)
+        if bucket is not None:
+            bucket.remove(item)
+            if not bucket:
+                del self.items[index]
+                self.tile_map.clear(index, TILE_ITEM)
+
+    def items_hit(self, rect):
+        """rect に触れているアイテムのリスト"""
+        hit = []
+        tiles = self.tiles
+        for i in self.cells(rect):
+            if i is None or not tiles[i] & TILE_ITEM:
+                continue
+            for item in self.items[i]:
+                if rect.colliderect(item.rect) and item not in hit:
+                    hit.append(item)
+        return hit
@@ -0,0 +1,39 @@
+class EntityList:
+    """エンティティ（アイテム・MOB）を隙間なく並べて持つリスト
+
+    list と同じように for で回せるが、remove() は消すものの位置を辞書で
+    引いて末尾の要素と入れ替えるので O(1)。そのかわり消した後の並び順は
+    変わる。
+    """
+
+    __slots__ = ("_items", "_index")
+
+    def __init__(self, entities=()):
+        self._items = []
+        self._index = {}  # エンティティ -> _items での位置
+        for entity in entities:
+            self.append(entity)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+    def __contains__(self, entity):
+        return entity in self._index
+
+    def append(self, entity):
+        self._index[entity] = len(self._items)
+        self._items.append(entity)
+
+    def remove(self, entity):
+        """末尾の要素と入れ替えて消す"""
+        i = self._index.pop(entity)
+        last = self._items.pop()
+        if last is not entity:
+            self._items[i] = last
+            self._index[last] = i
@@ -0,0 +1,85 @@
+from collections import deque
+
+from maze_gen import DIRECTIONS, WALL
+
+NONE = 255  # 届かない（または radius より遠い）セル
+HERE = 254  # プレイヤーのいるセル
+
+
+class FlowField:
+    """プレイヤーのいるセルに向かう「流れ」の場
+
+    プレイヤーのセルから1回だけ BFS をして、各セルに「次にどちらへ進めば
+    プレイヤーに近づくか」（DIRECTIONS の番号）を書き込んでおく。全ての追跡
+    MOBがこれを読むだけなので、MOBが何体いても経路探索はプレイヤーがセルを
+    移った時の1回で済む。radius を指定すると、その歩数より遠くは探さない。
+    """
+
+    def __init__(self, maze, radius=None):
+        self.maze = maze
+        self.radius = radius
+        self.flow = bytearray([NONE]) * (maze.rows * maze.cols)
+        self.cell = None  # 最後に BFS をしたプレイヤーのセル (x, y)
+        self._touched = []  # 前回書き込んだセル（次の更新で NONE に戻す）
+
+    def update(self, cell_x, cell_y):
+        """プレイヤーのセルが変わった時だけ作り直す。作り直したら True"""
+        if self.cell == (cell_x, cell_y):
+            return False
+        self.cell = (cell_x, cell_y)
+        flow, cells, cols = self.flow, self.maze.cells, self.maze.cols
+        last = self.maze.rows * cols
+        for i in self._touched:
+            flow[i] = NONE
+        start = cell_y * cols + cell_x
+        if not 0 <= start < last or cells[start] == WALL:
+            self._touched = []
+            return True
+        flow[start] = HERE
+        touched = [start]
+        dist = {start: 0}
+        queue = deque([start])
+        # 隣のセル n から見て、来た方向の逆（k ^ 1）がプレイヤーへの向き
+        steps = [(k, dy * cols + dx) for k, (dx, dy) in enumerate(DIRECTIONS)]
+        while queue:
+            i = queue.popleft()
+            d = dist[i] + 1
+            if self.radius is not None and d > self.radius:
+                continue
+            x = i % cols
+            for k, delta in steps:
+                n = i + delta
+                if not 0 <= n < last or (delta == -1 and x == 0) or (delta == 1 and x == cols - 1):
+                    continue
+                if flow[n] == NONE and cells[n] != WALL:
+                    flow[n] = k ^ 1
+                    dist[n] = d
+                    touched.append(n)
+                    queue.append(n)
+        self._touched = touched
+        return True
+
+    def code_at(self, cell_x, cell_y):
+        return self.flow[cell_y * self.maze.cols + cell_x]
+
+
+def chase_direction(rect, flow_field, cell_size, target):
+    """rect（MOB）がプレイヤーへ向かうための向き。流れの外なら None
+
+    曲がる時は、まず今のセルの列（行）に収まるまで寄せてから進む。
+    """
+    cx, cy = rect.centerx // cell_size, rect.centery // cell_size
+    code = flow_field.code_at(cx, cy)
+    if code == NONE:
+        return None
+    if code == HERE:
+        dx, dy = target[0] - rect.centerx, target[1] - rect.centery
+        if abs(dx) >= abs(dy):
+            return (1 if dx > 0 else -1, 0) if dx else (0, 0)
+        return (0, 1 if dy > 0 else -1)
+    dx, dy = DIRECTIONS[code]
+    if dx and not (cy * cell_size <= rect.top and rect.bottom <= (cy + 1) * cell_size):
+        return (0, 1 if rect.centery < cy * cell_size + cell_size // 2 else -1)
+    if dy and not (cx * cell_size <= rect.left and rect.right <= (cx + 1) * cell_size):
+        return (1 if rect.centerx < cx * cell_size + cell_size // 2 else -1, 0)
+    return dx, dy
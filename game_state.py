@@ -0,0 +1,368 @@
+import random
+
+import pygame
+
+from collision import GridCollider
+from entities import EntityList
+from flow_field import FlowField, chase_direction
+from maze_gen import DIRECTIONS, WALL, FreeCellIndex, generate_maze
+from pathfinding import MazePaths
+from profiler import NULL_PROFILER
+from tile_map import TILE_VISITED, TileMap
+
+# step() に渡す入力（ビットマスク）
+UP = 1
+DOWN = 2
+LEFT = 4
+RIGHT = 8
+
+ITEM_TYPES = ["hp", "weapon", "invincible"]
+MOB_COLORS = [(255, 0, 0), (128, 0, 128), (255, 255, 0)]
+
+# シミュレーションの速さ（1秒あたりのティック数）。速さは px/ティック、時間はティックで数える
+TICK_RATE = 60
+
+# ゲームバランス
+DAMAGE_WALL_RATE = 0.2  # 壁がダメージ壁になる確率
+DAMAGE = 10  # ダメージ壁に触れた時に減るHP
+DAMAGE_INVINCIBLE_TICKS = 2 * TICK_RATE  # ダメージ後の無敵時間（2秒）
+ITEM_INVINCIBLE_TICKS = 5 * TICK_RATE  # 無敵アイテムの効果時間（5秒）
+MAX_HEALTH = 100
+MOB_SAFE_DISTANCE = 4  # スタートからこの歩数以内にはMOBを出さない
+OFFSCREEN_MOB_INTERVAL = 4  # 画面外のMOBはこのティックごとにまとめて動かす
+HUNTER_RADIUS = 40  # 追跡MOBがプレイヤーに気づく歩数
+
+
+def inputs_from_keys(keys):
+    """pygame.key.get_pressed() の結果を step() 用のビットマスクにする"""
+    inputs = 0
+    if keys[pygame.K_w] or keys[pygame.K_UP]:
+        inputs |= UP
+    if keys[pygame.K_s] or keys[pygame.K_DOWN]:
+        inputs |= DOWN
+    if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+        inputs |= LEFT
+    if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+        inputs |= RIGHT
+    return inputs
+
+
+# アイテムのクラス
+class Item:
+    __slots__ = ("rect", "type")
+
+    def __init__(self, x, y, item_type, cell_size):
+        self.rect = pygame.Rect(x, y, cell_size, cell_size)
+        self.type = item_type  # "hp", "weapon", "invincible"
+
+
+# 敵MOBクラス
+class Mob:
+    __slots__ = ("rect", "speed", "direction", "color", "hunter", "prev")
+
+    def __init__(self, x, y, speed, size, rng, hunter=False):
+        self.rect = pygame.Rect(x, y, size, size)
+        self.speed = speed
+        self.direction = rng.choice(DIRECTIONS)
+        self.color = rng.choice(MOB_COLORS)
+        self.hunter = hunter  # True ならフローフィールドに沿ってプレイヤーを追う
+        self.prev = self.rect.topleft  # 前のティックの位置（描画の補間用）
+
+    def move(self, collider, rng, bounds, steps=1):
+        """steps ティック分まとめて動く（画面外のMOBを間引く時に使う）"""
+        self.prev = self.rect.topleft
+        dx, dy = self.direction
+        new_rect = self.rect.move(dx * self.speed * steps, dy * self.speed * steps)
+        if not collider.hits_wall(new_rect):
+            self.rect = new_rect
+        else:
+            self.direction = rng.choice(DIRECTIONS)
+        if not bounds.contains(self.rect):
+            self.direction = rng.choice(DIRECTIONS)
+
+
+def draw_mob(screen, rect, color):
+    """MOBを1体描く（目のついた丸）"""
+    center = (rect.centerx, rect.centery)
+    pygame.draw.circle(screen, color, center, rect.width // 2)
+    eye_offset = rect.width // 4
+    eye_radius = rect.width // 8
+    pygame.draw.circle(screen, (255, 255, 255), (center[0] - eye_offset, center[1] - eye_offset), eye_radius)
+    pygame.draw.circle(screen, (255, 255, 255), (center[0] + eye_offset, center[1] - eye_offset), eye_radius)
+    pygame.draw.circle(screen, (0, 0, 0), (center[0] - eye_offset, center[1] - eye_offset), eye_radius // 2)
+    pygame.draw.circle(screen, (0, 0, 0), (center[0] + eye_offset, center[1] - eye_offset), eye_radius // 2)
+
+
+def maze_seed(seed):
+    """GameState(seed=seed) が迷路を作る時に generate_maze() へ渡すシード"""
+    return random.Random(seed).getrandbits(64)
+
+
+class GameState:
+    """描画をしないゲーム本体
+
+    画面や画像には触らないので、SDL の dummy ドライバや画面のないCIでも
+    step() を回すだけで何千ゲームでもシミュレーションできる。
+    """
+
+    def __init__(self, rows, cols, cell_size, seed=None, algorithm="backtracker",
+                 num_items=5, num_mobs=10, mob_speed=2, player_speed=4,
+                 damage_wall_rate=DAMAGE_WALL_RATE, vectorized_mobs=False,
+                 hunter_ratio=0.0, maze=None, tiles=None, active_size=None):
+        self.rng = random.Random(seed)
+        self.cell_size = cell_size
+        self.rows, self.cols = rows, cols
+        self.bounds = pygame.Rect(0, 0, cols * cell_size, rows * cell_size)
+
+        # 迷路の生成（作ってある迷路やタイルマップを渡せばそれを使う）
+        # 渡された時も乱数は引いておき、その後の配置が作った時と同じになるようにする
+        maze_bits = self.rng.getrandbits(64)
+        if maze is None:
+            maze = generate_maze(rows, cols, seed=maze_bits, algorithm=algorithm)
+        self.maze = maze
+
+        # 当たり判定と描画の壁・ダメージ壁・ゴールはタイルマップのフラグで持つ（Rect は作らない）
+        if tiles is None:
+            damage = [i for i, cell in enumerate(maze.cells)
+                      if cell == WALL and self.rng.random() < damage_wall_rate]  # 一定確率でダメージ壁にする
+            tiles = TileMap.from_maze(maze, cell_size, damage)
+        self.tiles = tiles
+        gx, gy = self.maze.goal
+        self.goal = pygame.Rect(gx * cell_size, gy * cell_size, cell_size, cell_size)
+
+        # グリッドベースの当たり判定
+        self.collider = GridCollider(self.tiles)
+
+        # 置き場所の候補（通路セルの一覧）と最短経路は、初めて使う時に迷路ごとに1回だけ作る
+        # （MOBもアイテムも置かない load_game() では作らずに済む）
+        self._free_cells = None
+        self._paths = None
+
+        # 敵MOBの配置（スタートから MOB_SAFE_DISTANCE 歩以内には出さない）
+        spawns = []
+        if num_mobs:
+            spawns = [(i % cols * cell_size, i // cols * cell_size)
+                      for i in self.free_cells.sample(self.rng, num_mobs, min_dist=MOB_SAFE_DISTANCE)]
+        # 大量のMOBは NumPy でまとめて動かす（numpy が必要なのはこの時だけ）
+        self.vectorized_mobs = vectorized_mobs
+        num_hunters = round(len(spawns) * hunter_ratio)  # 先頭の num_hunters 体が追跡MOB
+        if vectorized_mobs:
+            from mob_swarm import MobSwarm
+            self.mobs = MobSwarm([x for x, _ in spawns], [y for _, y in spawns], mob_speed,
+                                 cell_size // 3, seed=self.rng.getrandbits(64), hunters=num_hunters)
+        else:
+            self.mobs = EntityList(Mob(x, y, mob_speed, cell_size // 3, self.rng, hunter=i < num_hunters)
+                                   for i, (x, y) in enumerate(spawns))
+        # 追跡MOBが共有するフローフィールド（プレイヤーがセルを移った時だけ作り直す）
+        self.flow_field = None
+        if num_hunters:
+            self.flow_field = FlowField(self.maze, HUNTER_RADIUS)
+
+        self.init_player(player_speed)
+        # プレイヤーを中心にこの大きさ（画面の大きさ）の外にいるMOBは間引いて動かす（None なら全員毎ティック）
+        # 描画のカメラではなくゲームの状態だけから決めるので、同じ入力なら同じ結果になる
+        self.active_size = active_size
+
+        # アイテム生成
+        self.items = EntityList(self.generate_items(num_items))
+        for item in self.items:
+            self.collider.add_item(item)
+
+    def init_player(self, player_speed):
+        """プレイヤーとステータスを最初の状態にする（スタートはセル (1, 1)）"""
+        cell_size = self.cell_size
+        # プレイヤーの初期設定
+        self.player_size = cell_size // 2
+        self.player_x = self.player_y = cell_size + cell_size // 4
+        self.prev_player = (self.player_x, self.player_y)  # 前のティックの位置（描画の補間用）
+        self.player_speed = player_speed
+        self.player_health = MAX_HEALTH
+
+        # 無敵状態の管理
+        self.invincible = False
+        self.invincible_ticks = 0  # ダメージ後の無敵の残りティック
+
+        # ステータス
+        self.weapon_active = False
+        self.invincible_item = False
+        self.weapon_timer = 0
+        self.invincible_timer = 0
+
+        self.profiler = NULL_PROFILER  # 計測する時は FrameProfiler を入れる
+        self.tick = 0
+        self.damage_taken = 0
+        self.result = None  # None（プレイ中）, "clear", "over"
+
+    # アイテム生成関数
+    def generate_items(self, num_items):
+        """スタートから歩いて行ける通路にアイテムを置く（同じセルには置かない）"""
+        if not num_items:
+            return []
+        cs, cols = self.cell_size, self.cols
+        return [Item(i % cols * cs, i // cols * cs, self.rng.choice(ITEM_TYPES), cs)
+                for i in self.free_cells.sample(self.rng, num_items)]
+
+    def __getstate__(self):
+        # 経路キャッシュは迷路から作り直せるので、pickle（チェックポイントなど）には入れない
+        state = self.__dict__.copy()
+        state["_paths"] = None
+        return state
+
+    @property
+    def free_cells(self):
+        """通路セルを条件付きで選べる FreeCellIndex（MOB・アイテムの置き場所）"""
+        if self._free_cells is None:
+            self._free_cells = FreeCellIndex(self.maze)
+        return self._free_cells
+
+    @property
+    def paths(self):
+        """迷路の2セル間の距離・経路を引ける MazePaths（ヒント・エージェントで共有する）"""
+        if self._paths is None:
+            self._paths = MazePaths(self.maze)
+        return self._paths
+
+    def tile_flags(self, x, y):
+        """セル (x, y) のタイルのフラグ（迷路の外は 0）"""
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return self.tiles.tiles[y * self.cols + x]
+        return 0
+
+    def mark_visited(self, x, y):
+        self.tiles.set(y * self.cols + x, TILE_VISITED)
+
+    @property
+    def player_rect(self):
+        return pygame.Rect(self.player_x, self.player_y, self.player_size, self.player_size)
+
+    def step(self, inputs):
+        """入力ビットマスクを受け取り、ゲームを1ティック進める（描画はしない）"""
+        if self.result is not None:
+            return self.result
+        self.tick += 1
+        prof = self.profiler
+
+        with prof.phase("collision"):
+            player_rect = self.move_player(inputs)
+        if self.result is not None:
+            return self.result
+
+        with prof.phase("items"):
+            self.check_item_collision(player_rect)
+
+        with prof.phase("mobs"):
+            self.update_mobs(player_rect)
+        if self.result is not None:
+            return self.result
+
+        if self.invincible_item:
+            self.invincible_timer -= 1
+            if self.invincible_timer <= 0:
+                self.invincible_item = False
+        return self.result
+
+    def move_player(self, inputs):
+        """プレイヤーを動かし、壁・ダメージ壁・ゴールを判定する"""
+        self.prev_player = (self.player_x, self.player_y)
+        new_x, new_y = self.player_x, self.player_y
+        if inputs & UP:
+            new_y -= self.player_speed
+        if inputs & DOWN:
+            new_y += self.player_speed
+        if inputs & LEFT:
+            new_x -= self.player_speed
+        if inputs & RIGHT:
+            new_x += self.player_speed
+
+        player_rect = pygame.Rect(new_x, new_y, self.player_size, self.player_size)
+
+        # 壁との衝突判定
+        if not self.collider.hits_wall(player_rect):
+            self.player_x, self.player_y = new_x, new_y
+            half = self.player_size // 2
+            self.mark_visited((new_x + half) // self.cell_size, (new_y + half) // self.cell_size)
+
+        # ダメージ壁との衝突判定
+        if not self.invincible and self.collider.hits_damage(player_rect):
+            self.player_health -= DAMAGE  # 衝突ごとに体力を減少
+            self.damage_taken += DAMAGE
+            self.invincible = True  # 無敵状態を有効化
+            self.invincible_ticks = DAMAGE_INVINCIBLE_TICKS
+            if self.player_health <= 0:
+                self.result = "over"
+                return player_rect
+
+        # 無敵状態の時間確認
+        if self.invincible:
+            self.invincible_ticks -= 1
+            if self.invincible_ticks <= 0:
+                self.invincible = False
+
+        # ゴール判定
+        if self.goal is not None and player_rect.colliderect(self.goal):
+            self.result = "clear"
+        return player_rect
+
+    def update_mobs(self, player_rect):
+        """MOBの移動とプレイヤーとの接触判定"""
+        target = (self.player_x + self.player_size // 2, self.player_y + self.player_size // 2)
+        if self.flow_field is not None:
+            self.flow_field.update(target[0] // self.cell_size, target[1] // self.cell_size)
+        if self.vectorized_mobs:
+            if self.flow_field is not None:
+                self.mobs.chase(self.flow_field, self.cell_size, target)
+            self.mobs.move(self.collider, self.bounds)
+            touching = self.mobs.touching(player_rect)
+        else:
+            lazy_tick = self.tick % OFFSCREEN_MOB_INTERVAL == 0
+            active = self.active_area(target)
+            for mob in self.mobs:
+                if mob.hunter:
+                    self.steer_hunter(mob, target)
+                if active is None or active.colliderect(mob.rect):
+                    mob.move(self.collider, self.rng, self.bounds)
+                elif lazy_tick:
+                    mob.move(self.collider, self.rng, self.bounds, OFFSCREEN_MOB_INTERVAL)
+            touching = [mob for mob in self.mobs if player_rect.colliderect(mob.rect)]
+        for mob in touching:
+            if self.weapon_timer > 0:  # 武器所有で敵を倒す
+                self.mobs.remove(mob)
+                self.weapon_timer -= 1
+            elif not self.invincible_item:  # 無敵でない場合はゲームオーバー
+                self.result = "over"
+                return
+
+    def active_area(self, center):
+        """MOBを毎ティック動かす範囲（None なら全員）"""
+        if self.active_size is None:
+            return None
+        area = pygame.Rect((0, 0), self.active_size)
+        area.center = center
+        return area.clamp(self.bounds)
+
+    def steer_hunter(self, mob, target):
+        """追跡MOBの向きをフローフィールドに合わせる（流れの外ならそのまま歩き回る）"""
+        direction = chase_direction(mob.rect, self.flow_field, self.cell_size, target)
+        if direction is not None and direction != (0, 0):
+            mob.direction = direction
+
+    # アイテム取得判定
+    def check_item_collision(self, player_rect):
+        for item in self.collider.items_hit(player_rect):
+            if item.type == "hp":
+                self.player_health = min(self.player_health + 10, MAX_HEALTH)
+            elif item.type == "weapon":
+                self.weapon_active = True
+                self.weapon_timer = 1  # 一回だけ敵を倒せるカウント
+            elif item.type == "invincible":
+                self.invincible_item = True
+                self.invincible_timer = ITEM_INVINCIBLE_TICKS
+            self.items.remove(item)
+            self.collider.remove_item(item)
+
+
+def run_headless(state, agent, max_ticks=10000):
+    """画面なしで agent(state) -> 入力 を与え続け、終わるまで進める"""
+    while state.result is None and state.tick < max_ticks:
+        state.step(agent(state))
+    return state
@@ -0,0 +1,184 @@
+import random
+from collections import OrderedDict
+
+from entities import EntityList
+from game_state import DAMAGE_WALL_RATE, GameState
+from maze_gen import ALGORITHMS, GOAL, WALL, Maze
+from tile_map import TILE_DAMAGE, TILE_VISITED, TILE_WALL
+
+CHUNK_CELLS = 16  # 1チャンクの一辺のセル数（偶数。部屋は奇数座標に並ぶ）
+MAX_CHUNKS = 256  # メモリに置いておくチャンクの上限（古いものから捨てる）
+DOORS_PER_SEAM = 2  # チャンクの境目に開ける通路の数
+
+_TO_TILES = bytes(TILE_WALL if i in (WALL, GOAL) else 0 for i in range(256))
+
+
+class InfiniteMaze:
+    """必要になったところだけ作る、果てのない迷路
+
+    世界を CHUNK_CELLS 四方のチャンクに分け、チャンク座標から決まるシードで
+    1チャンクずつ掘る。チャンクの左端の列と上端の行が隣との境目で、そこに
+    開ける通路も境目の座標だけから決まるので、どちらのチャンクを先に作っても
+    継ぎ目は必ずつながる。中身は TileMap と同じフラグで持ち、max_chunks を
+    超えたら使っていないものから捨てる（同じシードから同じものを作り直せる）。
+    """
+
+    def __init__(self, seed=0, algorithm="backtracker", damage_wall_rate=0.2,
+                 chunk_cells=CHUNK_CELLS, max_chunks=MAX_CHUNKS):
+        if chunk_cells % 2:
+            raise ValueError("chunk_cells は偶数にしてください")
+        self.seed = seed
+        self.algorithm = algorithm
+        self.damage_wall_rate = damage_wall_rate
+        self.chunk_cells = chunk_cells
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()  # (cx, cy) -> bytearray（タイルのフラグ）
+        self.generated = 0  # これまでに作ったチャンクの数
+
+    def _rng(self, *key):
+        return random.Random(":".join(str(k) for k in (self.seed, *key)))
+
+    def _doors(self, kind, cx, cy):
+        """境目に開ける通路の位置（部屋の番号）"""
+        rooms = self.chunk_cells // 2
+        return self._rng(kind, cx, cy).sample(range(rooms), min(DOORS_PER_SEAM, rooms))
+
+    def _generate(self, cx, cy):
+        n = self.chunk_cells
+        # 右と下に1列ずつ壁を足して掘ると、部屋が奇数座標に n // 2 個ずつ並ぶ
+        local = Maze(n + 1, n + 1)
+        rng = self._rng(cx, cy)
+        ALGORITHMS[self.algorithm](local, rng)
+        tiles = bytearray(n * n)
+        for y in range(n):
+            tiles[y * n:(y + 1) * n] = local.cells[y * (n + 1):y * (n + 1) + n].translate(_TO_TILES)
+        # 左と上の境目に通路を開ける（隣のチャンクも同じ位置を知っている）
+        for room in self._doors("v", cx, cy):
+            tiles[(2 * room + 1) * n] = 0
+        for room in self._doors("h", cx, cy):
+            tiles[2 * room + 1] = 0
+        for i in range(n * n):
+            if tiles[i] & TILE_WALL and rng.random() < self.damage_wall_rate:
+                tiles[i] |= TILE_DAMAGE
+        self.generated += 1
+        return tiles
+
+    def chunk(self, cx, cy):
+        """チャンクのタイル（なければ作る）"""
+        key = (cx, cy)
+        tiles = self.chunks.get(key)
+        if tiles is None:
+            tiles = self.chunks[key] = self._generate(cx, cy)
+            if len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(key)
+        return tiles
+
+    def prefetch(self, cx, cy, radius=1):
+        """(cx, cy) のまわりのチャンクを先に作っておく"""
+        for y in range(cy - radius, cy + radius + 1):
+            for x in range(cx - radius, cx + radius + 1):
+                self.chunk(x, y)
+
+    def tile(self, x, y):
+        """セル (x, y) のタイルのフラグ"""
+        n = self.chunk_cells
+        return self.chunk(x // n, y // n)[(y % n) * n + x % n]
+
+    def mark(self, x, y, flag):
+        """セル (x, y) にフラグを立てる（チャンクが捨てられると消える）"""
+        n = self.chunk_cells
+        self.chunk(x // n, y // n)[(y % n) * n + x % n] |= flag
+
+
+class InfiniteCollider:
+    """InfiniteMaze 用の当たり判定（GridCollider と同じ使い方）"""
+
+    def __init__(self, maze, cell_size):
+        self.maze = maze
+        self.cell_size = cell_size
+        self.items = {}  # 果てのない迷路にはアイテムを置かない
+
+    def cells(self, rect):
+        """rect が重なっているセル (x, y)"""
+        if rect.width <= 0 or rect.height <= 0:
+            return
+        cs = self.cell_size
+        for cy in range(rect.top // cs, (rect.bottom - 1) // cs + 1):
+            for cx in range(rect.left // cs, (rect.right - 1) // cs + 1):
+                yield cx, cy
+
+    def hits_wall(self, rect):
+        tile = self.maze.tile
+        return any(tile(x, y) & TILE_WALL for x, y in self.cells(rect))
+
+    def hits_damage(self, rect):
+        tile = self.maze.tile
+        return any(tile(x, y) & TILE_DAMAGE for x, y in self.cells(rect))
+
+    def items_hit(self, rect):
+        return []
+
+
+
+class EndlessState(GameState):
+    """果てのない迷路を進むモード
+
+    ゴールはなく、スタートからどれだけ遠くまで行けたか（best_distance）を
+    競う。迷路はプレイヤーのまわりのチャンクだけを作り、遠くのチャンクは
+    InfiniteMaze が捨てるので、どれだけ長く遊んでもメモリは増え続けない。
+    """
+
+    def __init__(self, cell_size, seed=None, algorithm="backtracker", player_speed=4,
+                 damage_wall_rate=DAMAGE_WALL_RATE, max_chunks=MAX_CHUNKS):
+        self.rng = random.Random(seed)
+        self.cell_size = cell_size
+        self.maze = InfiniteMaze(self.rng.getrandbits(64), algorithm, damage_wall_rate, max_chunks=max_chunks)
+        self.collider = InfiniteCollider(self.maze, cell_size)
+        # 果てがないので、迷路全体の大きさ・タイルマップ・通路の一覧・ゴールはない
+        self.rows = self.cols = None
+        self.tiles = None  # タイルは InfiniteMaze がチャンクごとに持つ
+        self._free_cells = None
+        self._paths = None
+        self.bounds = None
+        self.goal = None
+        self.items = EntityList()
+        self.mobs = EntityList()
+        self.vectorized_mobs = False
+        self.flow_field = None
+        self.active_size = None
+        self.init_player(player_speed)
+        self.chunk = None  # プレイヤーのいるチャンク
+        self.best_distance = 0  # スタートから一番離れたセルまでの距離（縦横の歩数の和）
+        self.update_chunks()
+
+    @property
+    def free_cells(self):
+        raise ValueError("果てのない迷路では通路の一覧を作れません")
+
+    @property
+    def paths(self):
+        raise ValueError("果てのない迷路では最短経路を引けません")
+
+    def tile_flags(self, x, y):
+        return self.maze.tile(x, y)
+
+    def mark_visited(self, x, y):
+        self.maze.mark(x, y, TILE_VISITED)
+
+    def step(self, inputs):
+        result = super().step(inputs)
+        self.update_chunks()
+        return result
+
+    def update_chunks(self):
+        """プレイヤーが別のチャンクに入ったら、まわりのチャンクを先に作っておく"""
+        half = self.player_size // 2
+        x, y = (self.player_x + half) // self.cell_size, (self.player_y + half) // self.cell_size
+        self.best_distance = max(self.best_distance, abs(x - 1) + abs(y - 1))
+        n = self.maze.chunk_cells
+        chunk = (x // n, y // n)
+        if chunk != self.chunk:
+            self.chunk = chunk
+            self.maze.prefetch(*chunk)
@@ -1,24 +1,35 @@
 import pygame
 import sys
-import random
-import heapq
-import time
-import pygame as pg
 import os
+import random
+from collections import OrderedDict
+
+from assets import AssetManager, TextCache, get_font
+from bot import SolverBot
+from camera import Camera
+from game_state import DOWN, LEFT, RIGHT, TICK_RATE, UP, draw_mob, inputs_from_keys
+from infinite_maze import EndlessState
+from levels import LevelPrefetcher, level_params
+from profiler import NULL_PROFILER, FrameProfiler
+from replay import Recording, make_state
+from savegame import load_game, save_game
+from tile_map import TILE_DAMAGE, TILE_GOAL, TILE_WALL
+from timestep import FixedTimestep, lerp_pos
 
 #画像ファイルの場所を取得
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-# Pygameの初期化
-pygame.init()
-
 # 画面の設定
 WIDTH, HEIGHT = 1024, 768  # 画面の大きさ
 CELL_SIZE = 50  # セルサイズを大きく設定（道を広くする）
-ROWS, COLS = HEIGHT // CELL_SIZE, WIDTH // CELL_SIZE  # 画面に収まるように行数と列数を計算
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Maze Game with Invincibility")
-pygame.display.set_caption("Maze Game with Items")
+ROWS, COLS = HEIGHT // CELL_SIZE, WIDTH // CELL_SIZE  # 迷路の大きさ（画面より大きくするとカメラがスクロールする）
+MAZE_SEED = None  # 数値を入れると毎回同じ迷路になる
+MAZE_ALGORITHM = "backtracker"  # "backtracker", "kruskal", "prim", "eller"
+NUM_MOBS = 10  # 敵MOBの数
+HUNTER_RATIO = 0.0  # プレイヤーを追いかけるMOBの割合（0.0〜1.0）
+VECTORIZED_MOBS = False  # True にするとMOBを NumPy でまとめて動かす（数百体以上向け、numpy が必要）
+ENDLESS_MODE = False  # True にするとゴールのない果てしない迷路を進むモードになる
+DIRTY_RECTS = False  # True にすると変わった部分だけ画面に送る（ソフトウェア描画の遅いPC向け）
 
 # 色の定義
 WHITE = (255, 255, 255)
@@ -29,315 +40,446 @@ GREEN = (0, 255, 0)
 YELLOW = (255, 255, 0)
 ORANGE = (255, 165, 0)  # 敵MOBの色
 
-# フレームレート
+# フレームレート（描画の上限。ゲームの進む速さは game_state.TICK_RATE で決まる）
 FPS = 60
-clock = pygame.time.Clock()
-
-# アイテム画像の読み込み
-ITEM_IMAGES = {
-    "hp": pygame.image.load("fig/hp.png"),
-    "weapon": pygame.image.load("fig/sword1.png"),
-    "invincible": pygame.image.load("fig/star.png"),
-}
-
-# アイテム画像をセルサイズにリサイズ
-for key in ITEM_IMAGES:
-    ITEM_IMAGES[key] = pygame.transform.scale(ITEM_IMAGES[key], (CELL_SIZE, CELL_SIZE))
-
-# 迷路生成関数（ゴールを最も遠い点に置く）
-def generate_maze(rows, cols):
-    maze = [[1 for _ in range(cols)] for _ in range(rows)]
-
-    def carve_passages(cx, cy):
-        directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]  # 上下左右
-        random.shuffle(directions)
-        for dx, dy in directions:
-            nx, ny = cx + dx * 2, cy + dy * 2  # 通路の幅を広げるために 2セル飛ばす
-            if 0 < nx < cols - 1 and 0 < ny < rows - 1 and maze[ny][nx] == 1:
-                maze[cy + dy][cx + dx] = 0  # 壁を削除
-                maze[ny][nx] = 0  # 壁を削除
-                carve_passages(nx, ny)
-
-    def find_furthest_point(start_x, start_y):
-        distances = [[-1 for _ in range(cols)] for _ in range(rows)]
-        pq = [(0, start_x, start_y)]  # ヒープの初期化
-        distances[start_y][start_x] = 0
-        furthest = (start_x, start_y, 0)
-
-        while pq:
-            dist, x, y = heapq.heappop(pq)
-            for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < cols and 0 <= ny < rows and maze[ny][nx] == 0 and distances[ny][nx] == -1:
-                    new_dist = dist + 1
-                    distances[ny][nx] = new_dist
-                    heapq.heappush(pq, (new_dist, nx, ny))
-                    if new_dist > furthest[2]:
-                        furthest = (nx, ny, new_dist)
-        return furthest
-
-    maze[1][1] = 0  # プレイヤー初期位置
-    carve_passages(1, 1)
-    furthest_x, furthest_y, _ = find_furthest_point(1, 1)
-    maze[furthest_y][furthest_x] = 2  # ゴール位置
-    return maze
-
-# アイテムのクラス
-class Item:
-    def __init__(self, x, y, item_type):
-        self.rect = pygame.Rect(x, y, CELL_SIZE, CELL_SIZE)
-        self.type = item_type  # "hp", "weapon", "invincible"
-
-    def draw(self):
-        SCREEN.blit(ITEM_IMAGES[self.type], self.rect.topleft)
-
-# アイテム生成関数
-def generate_items(maze, num_items):
-    items = []
-    for _ in range(num_items):
-        while True:
-            x = random.randint(1, COLS - 2) * CELL_SIZE
-            y = random.randint(1, ROWS - 2) * CELL_SIZE
-            if maze[y // CELL_SIZE][x // CELL_SIZE] == 0:
-                item_type = random.choice(["hp", "weapon", "invincible"])
-                items.append(Item(x, y, item_type))
-                break
-    return items
-
-# 敵MOBクラス
-class Mob:
-    def __init__(self, x, y, speed):
-        self.rect = pygame.Rect(x, y, CELL_SIZE // 3, CELL_SIZE // 3)
-        self.speed = speed
-        self.direction = random.choice([(0, -1), (0, 1), (-1, 0), (1, 0)])
-        self.color = random.choice([RED, (128, 0, 128), (255, 255, 0)])
-
-    def move(self, walls):
-        dx, dy = self.direction
-        new_rect = self.rect.move(dx * self.speed, dy * self.speed)
-        if not any(new_rect.colliderect(wall) for wall in walls):
-            self.rect = new_rect
-        else:
-            self.direction = random.choice([(0, -1), (0, 1), (-1, 0), (1, 0)])
-        if self.rect.left < 0 or self.rect.right > WIDTH or self.rect.top < 0 or self.rect.bottom > HEIGHT:
-            self.direction = random.choice([(0, -1), (0, 1), (-1, 0), (1, 0)])
-
-    def draw(self, screen):
-        center = (self.rect.centerx, self.rect.centery)
-        pygame.draw.circle(screen, self.color, center, self.rect.width // 2)
-        eye_offset = self.rect.width // 4
-        eye_radius = self.rect.width // 8
-        pygame.draw.circle(screen, WHITE, (center[0] - eye_offset, center[1] - eye_offset), eye_radius)
-        pygame.draw.circle(screen, WHITE, (center[0] + eye_offset, center[1] - eye_offset), eye_radius)
-        pygame.draw.circle(screen, BLACK, (center[0] - eye_offset, center[1] - eye_offset), eye_radius // 2)
-        pygame.draw.circle(screen, BLACK, (center[0] + eye_offset, center[1] - eye_offset), eye_radius // 2)
-
-
-# 迷路の生成
-maze = generate_maze(ROWS, COLS)
-
-# 壁とゴールのリスト
-walls = []
-damage_walls = []
-goal = None
-for row_index, row in enumerate(maze):
-    for col_index, cell in enumerate(row):
-        if cell == 1:
-            wall_rect = pygame.Rect(col_index * CELL_SIZE, row_index * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-            walls.append(wall_rect)
-            # 一定確率でダメージ壁を追加
-            if random.random() < 0.2:  # 20%の確率でダメージ壁にする
-                damage_walls.append(wall_rect)
-        elif cell == 2:  # ゴールの位置
-            goal = pygame.Rect(col_index * CELL_SIZE, row_index * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-
-# 敵MOBの配置
-mobs = []
-while len(mobs) < 10:
-    mob_x = random.randint(1, COLS - 2) * CELL_SIZE
-    mob_y = random.randint(1, ROWS - 2) * CELL_SIZE
-    mob_rect = pygame.Rect(mob_x, mob_y, CELL_SIZE // 2, CELL_SIZE // 2)
-    if not any(mob_rect.colliderect(wall) for wall in walls):
-        mobs.append(Mob(mob_x, mob_y, 2))
-
-# プレイヤーの初期位置
-player_size = CELL_SIZE // 3
-# プレイヤーの初期設定
-player_size = CELL_SIZE // 2
-player_x, player_y = CELL_SIZE + (CELL_SIZE // 4), CELL_SIZE + (CELL_SIZE // 4)
-player_speed = 4
-player_health = 100  # プレイヤーの体力
-
-# 無敵状態の管理
-invincible = False
-invincible_start_time = 0
-
-# ステータス
-weapon_active = False
-invincible_item = False
-weapon_timer = 0
-invincible_timer = 0
-invincible_flash = False  # 無敵中の点滅状態
-
-# アイテム生成
-items = generate_items(maze, 5)
-
-# プレイヤー画像の読み込み
-player_image = pg.image.load(f"fig/3.png") #こうかとんの画像
-player_image = pygame.transform.scale(player_image, (player_size, player_size))  # プレイヤーの大きさにリサイズ
-
-# 描画関数（変更点）
-def draw_player_wall(x, y, invincible):
-    # 無敵状態なら点滅させる
-    if invincible and int(time.time() * 5) % 2 == 0:  # 点滅効果
-        return
-    SCREEN.blit(player_image, (x, y))  # 画像を描画
-
-try:
-    wall_image = pg.image.load(f"fig/zimen.jpg")  # 壁の画像ファイル
-    wall_image = pygame.transform.scale(wall_image, (CELL_SIZE, CELL_SIZE))  # セルサイズにリサイズ
-except FileNotFoundError:
-    print("Error: 壁の画像ファイルが見つかりません。")
-    pygame.quit()
-    sys.exit()
 
-PLAYER_IMAGE = pygame.image.load("fig/0.png")
-PLAYER_IMAGE = pygame.transform.scale(PLAYER_IMAGE, (player_size, player_size))
-
-def draw_player(x, y):
-    global invincible_flash
-    player_image = PLAYER_IMAGE.copy()
-    
-    if invincible or invincible_item:
-        invincible_flash = (invincible_flash + 1) % 30  # 点滅スピード調整（30フレームで切り替え）
-        if invincible_flash < 15:
-            # 黄色く点滅
-            yellow_tint = pygame.Surface(player_image.get_size())
-            yellow_tint.fill(YELLOW)
-            player_image.blit(yellow_tint, (0, 0), special_flags=pygame.BLEND_MULT)
-    
-    SCREEN.blit(player_image, (x, y))
-
-# 迷路を描画する関数の修正
-def draw_maze():
-    for wall in walls:
-        if wall in damage_walls:
-            pygame.draw.rect(SCREEN, RED, wall)  # ダメージ壁は赤色
+# 計測（F3でオーバーレイ表示、F4でトレースを書き出す）
+PROFILE_TRACE_PATH = "trace.json"
+
+# セーブ（F5で保存、F9で続きから）
+SAVE_PATH = "save.sav"
+
+# ヒント（Hキーでゴールへの道を HINT_STEPS セル先まで表示する）
+HINT_STEPS = 12
+show_hint = False
+
+# 自動プレイ（Bキーで切り替え。キーボードの代わりにボットが入力する。果てのない迷路では何もしない）
+AUTO_PLAY = False
+
+# プレイの記録（シードと毎ティックの入力）。python replay.py で再生できる
+REPLAY_PATH = "last_session.rpl"
+
+# 面クリアの表示時間（ms）。次の面は遊んでいる間に裏で作っておく
+LEVEL_CLEAR_WAIT = 1500
+
+# 画面と画像（main() で用意する）
+SCREEN = None
+ATLAS = None  # アイテム・壁・プレイヤー（通常と黄色）を1枚に詰めたもの（SpriteAtlas）
+HUD_TEXT = None  # HUDの文字列キャッシュ
+background_image = None  # 画面と同じ大きさなのでアトラスには入れない
+
+
+def load_images(player_size):
+    """画面を作った後に画像を読み込む（リサイズ・アトラスに詰めた画像はディスクにキャッシュする）"""
+    global ATLAS, HUD_TEXT, background_image
+    assets = AssetManager(CELL_SIZE)
+    cell = (CELL_SIZE, CELL_SIZE)
+    # アイテム・壁・プレイヤーの画像はセルサイズにリサイズして1枚のアトラスに詰める
+    try:
+        ATLAS = assets.atlas("sprites", {
+            "hp": ("fig/hp.png", cell),
+            "weapon": ("fig/sword1.png", cell),
+            "invincible": ("fig/star.png", cell),
+            "wall": ("fig/zimen.jpg", cell),  # 壁の画像ファイル
+            "player": ("fig/0.png", (player_size, player_size)),
+        }, tints={"player": [YELLOW]})  # 無敵の時の黄色も先に作っておく
+    except FileNotFoundError:
+        print("Error: 画像ファイルが見つかりません。")
+        pygame.quit()
+        sys.exit()
+
+    # 背景画像の読み込み（画面サイズに合わせてリサイズ）
+    background_image = assets.image("fig/pg_bg.jpg", (WIDTH, HEIGHT), alpha=False)
+    assets.save()
+
+    HUD_TEXT = TextCache(get_font(36))
+
+
+def draw_player(state, camera, pos):
+    """プレイヤーを描いて、描いた範囲を返す"""
+    color = None
+    if state.invincible or state.invincible_item:
+        # 点滅もゲームのティックで数える（30ティックで1周）
+        if state.tick % 30 < 15:
+            color = YELLOW  # 黄色く点滅（作成済みの色違いを使う）
+
+    return ATLAS.blit(SCREEN, "player", camera.to_screen(pos), color)
+
+# 背景・壁・ダメージ壁・ゴールを焼き込んだ静的レイヤー
+# 大きな迷路でも画面に映る分だけ作れるように、CHUNK_CELLS 四方のチャンクに分けて持つ
+CHUNK_CELLS = 16
+MAX_CHUNKS = 64  # 覚えておくチャンクの上限（古いものから捨てる）
+static_chunks = OrderedDict()
+static_state = None
+
+# DIRTY_RECTS の時に前のフレームで描いた範囲（次のフレームで静的レイヤーから戻す）
+last_dirty = []
+last_view = None  # 前のフレームのカメラの範囲（動いたら全体を描き直す）
+
+def build_static_layer(state, chunks=None):
+    """迷路が変わった時に呼ぶ。チャンクは描画時に必要な分だけ作る
+
+    chunks に先に作っておいたチャンク（prerender_static の戻り値）を渡すと
+    それをそのまま使う。
+    """
+    global static_state, last_view
+    static_state = state
+    static_chunks.clear()
+    if chunks:
+        static_chunks.update(chunks)
+    last_view = None
+
+def prerender_static(state):
+    """スタート地点で画面に映るチャンクを先に作る（次の面を作るワーカースレッドで呼ぶ）"""
+    camera = make_camera(state)
+    camera.follow(state.player_x + state.player_size // 2, state.player_y + state.player_size // 2)
+    x0, y0, x1, y1 = camera.visible_cells(CHUNK_CELLS * CELL_SIZE)
+    return OrderedDict(((cx, cy), build_static_chunk(state, cx, cy))
+                       for cy in range(y0, y1) for cx in range(x0, x1))
+
+def build_static_chunk(state, chunk_x, chunk_y):
+    """1チャンク分の迷路の静的部分を1枚のSurfaceに合成する"""
+    size = CHUNK_CELLS * CELL_SIZE
+    ox, oy = chunk_x * size, chunk_y * size
+    layer = pygame.Surface((size, size))
+    # 背景はワールド座標で敷き詰める
+    bw, bh = background_image.get_size()
+    for by in range(oy - oy % bh, oy + size, bh):
+        for bx in range(ox - ox % bw, ox + size, bw):
+            layer.blit(background_image, (bx - ox, by - oy))
+    for y in range(chunk_y * CHUNK_CELLS, (chunk_y + 1) * CHUNK_CELLS):
+        for x in range(chunk_x * CHUNK_CELLS, (chunk_x + 1) * CHUNK_CELLS):
+            pos = (x * CELL_SIZE - ox, y * CELL_SIZE - oy)
+            tile = state.tile_flags(x, y)
+            if tile & TILE_WALL:
+                if tile & TILE_DAMAGE:
+                    pygame.draw.rect(layer, RED, (pos, (CELL_SIZE, CELL_SIZE)))  # ダメージ壁は赤色
+                else:
+                    ATLAS.blit(layer, "wall", pos)  # 壁の位置に画像を描画
+            elif tile & TILE_GOAL:
+                pygame.draw.rect(layer, GREEN, (pos, (CELL_SIZE, CELL_SIZE)))  # ゴールはそのまま
+    return layer.convert()  # 画面と同じピクセル形式にして毎フレームの変換を省く
+
+def get_static_chunk(chunk_x, chunk_y):
+    """チャンクをキャッシュから取り出す（なければ作る）"""
+    key = (chunk_x, chunk_y)
+    chunk = static_chunks.get(key)
+    if chunk is None:
+        chunk = static_chunks[key] = build_static_chunk(static_state, chunk_x, chunk_y)
+        if len(static_chunks) > MAX_CHUNKS:
+            static_chunks.popitem(last=False)
+    else:
+        static_chunks.move_to_end(key)
+    return chunk
+
+# 迷路を描画する関数（画面に映るチャンクだけをblitする）
+def draw_maze(camera):
+    view = camera.rect
+    if camera.world is not None and not camera.world.contains(view):
+        SCREEN.blit(background_image, (0, 0))  # 迷路が画面より小さい時の余白
+    size = CHUNK_CELLS * CELL_SIZE
+    x0, y0, x1, y1 = camera.visible_cells(size)
+    for cy in range(y0, y1):
+        for cx in range(x0, x1):
+            SCREEN.blit(get_static_chunk(cx, cy), camera.to_screen((cx * size, cy * size)))
+
+def restore_static(camera, rect):
+    """画面上の rect の部分だけ、静的レイヤーから描き直す"""
+    if camera.world is not None and not camera.world.contains(camera.rect):
+        SCREEN.blit(background_image, rect, rect)
+    world = rect.move(camera.rect.topleft)
+    size = CHUNK_CELLS * CELL_SIZE
+    x0, y0 = world.left // size, world.top // size
+    if camera.world is not None:
+        x0, y0 = max(0, x0), max(0, y0)  # 果てのない迷路ではマイナスのチャンクもある
+    for cy in range(y0, (world.bottom - 1) // size + 1):
+        for cx in range(x0, (world.right - 1) // size + 1):
+            chunk_rect = pygame.Rect(cx * size, cy * size, size, size)
+            if camera.world is not None and not camera.world.colliderect(chunk_rect):
+                continue
+            area = world.clip(chunk_rect).move(-chunk_rect.x, -chunk_rect.y)
+            SCREEN.blit(get_static_chunk(cx, cy), camera.to_screen((chunk_rect.x + area.x, chunk_rect.y + area.y)), area)
+
+def draw_game(state, camera, profiler, alpha=1.0):
+    """GameState の今の様子を画面に描く（画面に映るものだけ）
+
+    alpha は直前のティックから次のティックまでの割合で、動くものは前の
+    ティックの位置との間を補間して描く。
+    画面に送るべき範囲のリストを返す。None なら画面全体（flip する）。
+    """
+    global last_dirty, last_view
+    player_pos = lerp_pos(state.prev_player, (state.player_x, state.player_y), alpha)
+    camera.follow(player_pos[0] + state.player_size // 2, player_pos[1] + state.player_size // 2)
+    # カメラが動いた時とオーバーレイ表示中は全体を描き直す
+    full = not DIRTY_RECTS or profiler.show_overlay or camera.rect != last_view
+    with profiler.phase("draw_maze"):
+        if full:
+            draw_maze(camera)  # 背景と迷路はキャッシュから描く
         else:
-            SCREEN.blit(wall_image, wall.topleft)  # 壁の位置に画像を描画
-    pygame.draw.rect(SCREEN, GREEN, goal)  # ゴールはそのまま
-
-def display_game_clear():
-    font = pygame.font.Font(None, 74)
-    text = font.render("Game Clear!", True, RED)
+            for rect in last_dirty:
+                restore_static(camera, rect)  # 前のフレームで描いた所だけ消す
+    with profiler.phase("draw_sprites"):
+        dirty = draw_sprites(state, camera, player_pos, alpha)
+        if show_hint:
+            dirty += draw_hint(state, camera)
+    with profiler.phase("ui"):
+        dirty += draw_ui(state)
+        profiler.draw_overlay(SCREEN, get_font(24))
+
+    screen_rect = SCREEN.get_rect()
+    dirty = [rect.clip(screen_rect) for rect in dirty]
+    update = None if full else last_dirty + dirty
+    last_dirty = dirty
+    last_view = camera.rect.copy()
+    return update
+
+def draw_sprites(state, camera, player_pos, alpha):
+    """MOB・アイテム・プレイヤーを描いて、描いた範囲のリストを返す"""
+    dirty = []
+    for mob in state.mobs:
+        rect = mob.rect
+        if camera.rect.colliderect(rect):
+            # mob.rect はゲームの状態そのものなので、描く位置は別の Rect に作る
+            rect = pygame.Rect(camera.to_screen(lerp_pos(mob.prev, rect.topleft, alpha)), rect.size)
+            draw_mob(SCREEN, rect, mob.color)
+            dirty.append(rect)
+    # アイテムはセルごとに登録されているので、映っているセルだけ見る
+    cell_items = state.collider.items
+    if cell_items:
+        x0, y0, x1, y1 = camera.visible_cells(CELL_SIZE)
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                for item in cell_items.get(y * state.cols + x, ()):
+                    dirty.append(ATLAS.blit(SCREEN, item.type, camera.to_screen(item.rect.topleft)))
+    dirty.append(draw_player(state, camera, player_pos))
+    return dirty
+
+def draw_hint(state, camera):
+    """プレイヤーのいるセルからゴールへの道を点で描く（ゴールがなければ何もしない）"""
+    if state.goal is None:
+        return []
+    cols, cs = state.cols, CELL_SIZE
+    half = state.player_size // 2
+    here = (state.player_y + half) // cs * cols + (state.player_x + half) // cs
+    gx, gy = state.maze.goal
+    dirty = []
+    for cell in state.paths.path(here, gy * cols + gx)[1:HINT_STEPS + 1]:
+        center = camera.to_screen((cell % cols * cs + cs // 2, cell // cols * cs + cs // 2))
+        dirty.append(pygame.draw.circle(SCREEN, YELLOW, center, cs // 8))
+    return dirty
+
+# UI表示（描いた範囲のリストを返す）
+def draw_ui(state):
+    dirty = [SCREEN.blit(HUD_TEXT.render(f"HP: {state.player_health}", GREEN), (10, 10))]
+
+    if state.weapon_timer > 0:
+        dirty.append(SCREEN.blit(HUD_TEXT.render("Weapon Active", (255, 165, 0)), (10, 50)))
+    if state.invincible_item or state.invincible:
+        dirty.append(SCREEN.blit(HUD_TEXT.render("Invincible", (0, 255, 255)), (10, 90)))
+    if isinstance(state, EndlessState):
+        dirty.append(SCREEN.blit(HUD_TEXT.render(f"Distance: {state.best_distance}", WHITE), (WIDTH - 250, 10)))
+    return dirty
+
+def display_game_clear(level):
+    font = get_font(74)
+    text = font.render(f"Level {level} Clear!", True, RED)
     SCREEN.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - text.get_height() // 2))
     pygame.display.flip()
-    pygame.time.wait(3000)
+    pygame.time.wait(LEVEL_CLEAR_WAIT)
 
 def display_game_over():
-    font = pygame.font.Font(None, 74)
+    font = get_font(74)
     text = font.render("Game Over!", True, RED)
     SCREEN.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - text.get_height() // 2))
     pygame.display.flip()
     pygame.time.wait(3000)
-# アイテム取得判定
-def check_item_collision(player_rect, items):
-    global player_health, weapon_active, invincible_item, weapon_timer, invincible_timer
-    for item in items[:]:
-        if player_rect.colliderect(item.rect):
-            if item.type == "hp":
-                player_health = min(player_health + 10, 100)
-            elif item.type == "weapon":
-                weapon_active = True
-                weapon_timer = 1  # 一回だけ敵を倒せるカウント
-            elif item.type == "invincible":
-                invincible_item = True
-                invincible_timer = 300
-            items.remove(item)
-
-
-# 背景画像の読み込み
-background_image = pg.image.load(f"fig/pg_bg.jpg")
-background_image = pygame.transform.scale(background_image, (WIDTH, HEIGHT))  # 画面サイズに合わせてリサイズ
-
-# ゲームループ
-running = True
-while running:
-    SCREEN.blit(background_image,(0,0))
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
 
-    keys = pygame.key.get_pressed()
-    new_x, new_y = player_x, player_y
-    if keys[pygame.K_w] or keys[pygame.K_UP]:
-        new_y -= player_speed
-    if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-        new_y += player_speed
-    if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-        new_x -= player_speed
-    if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-        new_x += player_speed
-
-    player_rect = pygame.Rect(new_x, new_y, player_size, player_size)
-
-    # 壁との衝突判定
-    if not any(player_rect.colliderect(wall) for wall in walls):
-        player_x, player_y = new_x, new_y
-
-    # ダメージ壁との衝突判定
-    if not invincible and any(player_rect.colliderect(d_wall) for d_wall in damage_walls):
-        player_health -= 10  # 衝突ごとに体力を減少
-        invincible = True  # 無敵状態を有効化
-        invincible_start_time = time.time()
-        if player_health <= 0:
+
+def make_camera(state):
+    """迷路の大きさに合わせたカメラ（果てのない迷路なら範囲の制限なし）"""
+    if state.bounds is None:
+        return Camera(WIDTH, HEIGHT)
+    return Camera(WIDTH, HEIGHT, state.bounds.width, state.bounds.height)
+
+
+def check_dirty_rects(params, ticks=600):
+    """DIRTY_RECTS で描いた画面が毎フレーム全体の描き直しと同じになるか確かめる
+
+    違ったフレーム数を返す。入力はシードから決めたでたらめな歩き方（止まる時間も入れて、
+    カメラの動かないフレームを作る）。
+    """
+    global DIRTY_RECTS, last_dirty, last_view
+    state = make_state(params)
+    load_images(state.player_size)
+    build_static_layer(state)
+    camera = make_camera(state)
+    rng = random.Random(params.get("seed"))
+    keys = [0, 0, 0, UP, DOWN, LEFT, RIGHT]
+    inputs, mismatches = 0, 0
+    saved = DIRTY_RECTS
+    try:
+        for tick in range(ticks):
+            if tick % 20 == 0:
+                inputs = rng.choice(keys)
+            state.step(inputs)
+            if state.result is not None:
+                break
+            DIRTY_RECTS = True
+            draw_game(state, camera, NULL_PROFILER)
+            dirty = SCREEN.copy()
+            kept = last_dirty, last_view
+            DIRTY_RECTS = False
+            draw_game(state, camera, NULL_PROFILER)
+            if pygame.image.tobytes(SCREEN, "RGB") != pygame.image.tobytes(dirty, "RGB"):
+                mismatches += 1
+            # 次のフレームは DIRTY_RECTS で描いた画面の続きから描く
+            SCREEN.blit(dirty, (0, 0))
+            last_dirty, last_view = kept
+    finally:
+        DIRTY_RECTS = saved
+    return mismatches
+
+
+def main():
+    global SCREEN, show_hint
+    # Pygameの初期化
+    pygame.init()
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Maze Game with Items")
+    clock = pygame.time.Clock()
+    profiler = FrameProfiler()
+
+    # シードを決めておけば、記録した入力から同じプレイを再現できる
+    seed = MAZE_SEED if MAZE_SEED is not None else random.randrange(1 << 32)
+    level = 1
+    base = dict(rows=ROWS, cols=COLS, cell_size=CELL_SIZE, seed=seed, algorithm=MAZE_ALGORITHM,
+                num_mobs=NUM_MOBS, hunter_ratio=HUNTER_RATIO, vectorized_mobs=VECTORIZED_MOBS,
+                active_size=(WIDTH, HEIGHT))
+    if ENDLESS_MODE:
+        params = dict(mode="endless", cell_size=CELL_SIZE, seed=seed, algorithm=MAZE_ALGORITHM)
+    else:
+        params = level_params(base, level)
+    state = make_state(params)
+    recording = Recording()
+    recording.start_level(params)
+    state.profiler = profiler
+    load_images(state.player_size)
+    # 迷路が確定したので静的レイヤーを作っておく
+    build_static_layer(state)
+    camera = make_camera(state)
+    timestep = FixedTimestep(TICK_RATE)
+    bot = SolverBot() if AUTO_PLAY else None
+    # 遊んでいる間に次の面を作っておく
+    prefetcher = None
+    if not ENDLESS_MODE:
+        prefetcher = LevelPrefetcher(prepare=prerender_static)
+        prefetcher.start(level + 1, level_params(base, level + 1))
+        pygame.display.set_caption(f"Maze Game with Items - Level {level}")
+
+    # ゲームループ（シミュレーションは一定間隔、描画はできる範囲で）
+    running = True
+    while running:
+        with profiler.phase("input"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.show_overlay = not profiler.show_overlay
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    count = profiler.dump_trace(PROFILE_TRACE_PATH)
+                    print(f"{PROFILE_TRACE_PATH} に {count} 件の区間を書き出しました")
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                    try:
+                        save_game(state, SAVE_PATH)
+                    except (ValueError, OSError) as e:  # 果てのない迷路、書き込めない場所など
+                        print(e)
+                    else:
+                        print(f"{SAVE_PATH} に保存しました")
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                    show_hint = not show_hint
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_b:
+                    bot = SolverBot() if bot is None else None
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9 and os.path.exists(SAVE_PATH):
+                    if isinstance(state, EndlessState):
+                        # セーブデータはゴールのある面なので、クリアしても次の面がない
+                        print("果てのない迷路ではセーブデータを読み込めません")
+                        continue
+                    try:
+                        loaded = load_game(SAVE_PATH)
+                    except ValueError as e:
+                        print(e)  # 古い形式のセーブデータなど
+                        continue
+                    state = loaded
+                    state.profiler = profiler
+                    recording.end_level(None)  # 読み込んだ面は引数から作り直せないので記録しない
+                    build_static_layer(state)
+                    camera = make_camera(state)
+            inputs = inputs_from_keys(pygame.key.get_pressed())
+
+        for _ in range(timestep.advance()):
+            if bot is not None:
+                inputs = bot(state)  # ボットはティックごとに入力を決める
+            recording.record(inputs)
+            if state.step(inputs) is not None:
+                break
+        dirty = draw_game(state, camera, profiler, timestep.alpha)
+
+        if state.result == "clear":
+            display_game_clear(level)
+            recording.end_level("clear")
+            # 先に作っておいた次の面に差し替える
+            state, chunks = prefetcher.take()
+            level = prefetcher.level
+            recording.start_level(level_params(base, level))
+            state.profiler = profiler
+            build_static_layer(state, chunks)
+            camera = make_camera(state)
+            timestep = FixedTimestep(TICK_RATE)  # 表示で止まっていた分を追いかけない
+            prefetcher.start(level + 1, level_params(base, level + 1))
+            pygame.display.set_caption(f"Maze Game with Items - Level {level}")
+            dirty = draw_game(state, camera, profiler)
+        elif state.result == "over":
+            recording.end_level("over")
             display_game_over()
             running = False
 
-    # 無敵状態の時間確認
-    if invincible and time.time() - invincible_start_time > 2:
-        invincible = False
-
-    # ゴール判定
-    if player_rect.colliderect(goal):
-        display_game_clear()
-        running = False
-
-    check_item_collision(player_rect, items)
-
-    for mob in mobs[:]:
-        mob.move(walls)
-        mob.draw(SCREEN)
-        if player_rect.colliderect(mob.rect):
-            if weapon_timer > 0:  # 武器所有で敵を倒す
-                mobs.remove(mob)
-                weapon_timer -= 1
-            elif not invincible_item:  # 無敵でない場合はゲームオーバー
-                display_game_over()
-                running = False
-
-    if invincible_item:
-        invincible_timer -= 1
-        if invincible_timer <= 0:
-            invincible_item = False
-
-    draw_maze()
-    for item in items:
-        item.draw()
-    draw_player(player_x, player_y)
-
-    # UI表示
-    font = pygame.font.Font(None, 36)
-    hp_text = font.render(f"HP: {player_health}", True, GREEN)
-    SCREEN.blit(hp_text, (10, 10))
-
-    if weapon_timer > 0:
-        SCREEN.blit(font.render("Weapon Active", True, (255, 165, 0)), (10, 50))
-    if invincible_item or invincible:
-        SCREEN.blit(font.render("Invincible", True, (0, 255, 255)), (10, 90))
+        with profiler.phase("flip"):
+            if dirty is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty)  # 変わった部分だけ送る
+        profiler.end_frame()
+        clock.tick(FPS)
+
+    recording.end_level(state.result)
+    recording.save(REPLAY_PATH)
+    if prefetcher is not None:
+        prefetcher.close()
+    pygame.quit()
+    sys.exit()
+
+
+def check_main():
+    """python kokaton2.py --check-dirty で、迷路の広さの違う面と果てのない迷路を確かめる"""
+    global SCREEN
+    pygame.init()
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+    base = dict(rows=ROWS, cols=COLS, cell_size=CELL_SIZE, seed=0, num_mobs=NUM_MOBS, active_size=(WIDTH, HEIGHT))
+    cases = {
+        "level 1": level_params(base, 1),
+        "level 4": level_params(base, 4),  # 画面より広くカメラがスクロールする
+        "endless": dict(mode="endless", cell_size=CELL_SIZE, seed=0),
+    }
+    failed = False
+    for name, params in cases.items():
+        mismatches = check_dirty_rects(params)
+        failed |= mismatches > 0
+        print(name, "ok" if mismatches == 0 else f"{mismatches} frames differ")
+    pygame.quit()
+    return 1 if failed else 0
 
-    pygame.display.flip()
-    clock.tick(FPS)
 
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    if "--check-dirty" in sys.argv[1:]:
+        sys.exit(check_main())
+    main()
@@ -0,0 +1,77 @@
+"""面（レベル）の進行と、次の面の先読み
+
+今の面を遊んでいる間に、次の面の GameState（迷路・アイテム・MOBの配置）を
+別プロセスで作り、できたものに対してワーカースレッドで静的レイヤーの
+先描きなどの準備をしておく。クリアした時には出来上がったものに差し替える
+だけなので、大きな迷路でも待たされない。
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from game_state import GameState
+
+# 1面進むごとに増やす量
+GROW_CELLS = 4  # 迷路の縦横のセル数
+GROW_MOBS = 3  # MOBの数
+GROW_HUNTER_RATIO = 0.1  # 追跡MOBの割合
+MAX_HUNTER_RATIO = 0.5
+
+
+def level_params(base, level):
+    """level 面目の GameState の引数（面が進むほど迷路が広く、MOBが多くなる）"""
+    grow = level - 1
+    params = dict(base)
+    params["rows"] = base["rows"] + GROW_CELLS * grow
+    params["cols"] = base["cols"] + GROW_CELLS * grow
+    params["num_mobs"] = base.get("num_mobs", 10) + GROW_MOBS * grow
+    params["hunter_ratio"] = min(MAX_HUNTER_RATIO, base.get("hunter_ratio", 0.0) + GROW_HUNTER_RATIO * grow)
+    if base.get("seed") is not None:
+        params["seed"] = base["seed"] + grow  # シード指定なら面ごとに決まった迷路
+    return params
+
+
+def build_level(params):
+    """GameState を作る（ワーカープロセスで実行される）"""
+    return GameState(**params)
+
+
+class LevelPrefetcher:
+    """次の面を裏で作っておく
+
+    prepare を渡すと、出来た GameState を引数にワーカースレッドで呼び、
+    その戻り値も一緒に受け取れる（静的レイヤーの先描きなど）。
+    use_process=False なら GameState もスレッドで作る。
+    """
+
+    def __init__(self, prepare=None, use_process=True):
+        self.prepare = prepare
+        self.level = None
+        self._future = None
+        self._threads = ThreadPoolExecutor(max_workers=1)
+        # 画面を持っているプロセスを fork しないように spawn で起動する
+        self._processes = None
+        if use_process:
+            self._processes = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self, level, params):
+        """level 面目を作り始める"""
+        self.level = level
+        self._future = self._threads.submit(self._build, params)
+
+    def _build(self, params):
+        if self._processes is not None:
+            state = self._processes.submit(build_level, params).result()
+        else:
+            state = build_level(params)
+        prepared = self.prepare(state) if self.prepare is not None else None
+        return state, prepared
+
+    def take(self):
+        """出来上がった (state, prepare の戻り値) を受け取る（まだなら出来るまで待つ）"""
+        future, self._future = self._future, None
+        return future.result()
+
+    def close(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,157 @@
+import numpy as np
+import pygame
+
+from flow_field import HERE
+from game_state import DIRECTIONS, MOB_COLORS
+from tile_map import TILE_WALL
+
+_DIRS = np.array(DIRECTIONS, dtype=np.int32)
+
+
+class MobView:
+    """MobSwarm の1体分を Mob と同じように扱うためのビュー"""
+
+    __slots__ = ("swarm", "index")
+
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+
+    @property
+    def rect(self):
+        s = self.swarm
+        return pygame.Rect(int(s.x[self.index]), int(s.y[self.index]), s.size, s.size)
+
+    @property
+    def prev(self):
+        s = self.swarm
+        return int(s.prev_x[self.index]), int(s.prev_y[self.index])
+
+    @property
+    def color(self):
+        return MOB_COLORS[self.swarm.color[self.index]]
+
+    @property
+    def hunter(self):
+        return bool(self.swarm.hunter[self.index])
+
+
+class MobSwarm:
+    """たくさんのMOBを構造体配列（NumPy）でまとめて動かす
+
+    位置・向き・速さ・色を1本ずつの配列に持ち、移動・壁判定・方向転換を
+    配列演算で一度に行う。数百〜数千体でも1体ずつのループにならない。
+    """
+
+    def __init__(self, xs, ys, speed, size, seed=None, hunters=0):
+        self.rng = np.random.default_rng(seed)
+        n = len(xs)
+        self.size = size
+        self.count = n
+        self.x = np.array(xs, dtype=np.int32)
+        self.y = np.array(ys, dtype=np.int32)
+        self.prev_x = self.x.copy()  # 前のティックの位置（描画の補間用）
+        self.prev_y = self.y.copy()
+        d = self.rng.integers(0, len(DIRECTIONS), n)
+        self.dx = _DIRS[d, 0].copy()
+        self.dy = _DIRS[d, 1].copy()
+        self.speed = np.full(n, speed, dtype=np.int32)
+        self.color = self.rng.integers(0, len(MOB_COLORS), n).astype(np.uint8)
+        self.hunter = np.arange(n) < hunters  # 先頭の hunters 体が追跡MOB
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield MobView(self, i)
+
+    def _redirect(self, mask):
+        """mask が立っているMOBの向きをランダムに変える"""
+        k = int(mask.sum())
+        if k:
+            d = self.rng.integers(0, len(DIRECTIONS), k)
+            self.dx[:self.count][mask] = _DIRS[d, 0]
+            self.dy[:self.count][mask] = _DIRS[d, 1]
+
+    def move(self, collider, bounds):
+        """全MOBを1ティック分動かす（壁に当たるMOBは止まって向きを変える）"""
+        n = self.count
+        if n == 0:
+            return
+        cs, size = collider.cell_size, self.size
+        tiles = np.frombuffer(collider.tiles, dtype=np.uint8).reshape(collider.rows, collider.cols)
+        x, y = self.x[:n], self.y[:n]
+        self.prev_x[:n] = x
+        self.prev_y[:n] = y
+        nx = x + self.dx[:n] * self.speed[:n]
+        ny = y + self.dy[:n] * self.speed[:n]
+
+        # MOBはセルより小さいので、重なるのは最大 2×2 セル
+        x0, x1 = nx // cs, (nx + size - 1) // cs
+        y0, y1 = ny // cs, (ny + size - 1) // cs
+        outside = (x0 < 0) | (y0 < 0) | (x1 >= collider.cols) | (y1 >= collider.rows)
+        x0c, x1c = np.clip(x0, 0, collider.cols - 1), np.clip(x1, 0, collider.cols - 1)
+        y0c, y1c = np.clip(y0, 0, collider.rows - 1), np.clip(y1, 0, collider.rows - 1)
+        # 重なるセルのフラグだけを集めてから壁かどうかを見る（盤面全体には触らない）
+        hit = tiles[y0c, x0c] | tiles[y0c, x1c] | tiles[y1c, x0c] | tiles[y1c, x1c]
+        blocked = outside | (hit & TILE_WALL).astype(bool)
+
+        free = ~blocked
+        x[free] = nx[free]
+        y[free] = ny[free]
+        self._redirect(blocked)
+        out = (x < bounds.left) | (y < bounds.top) | (x + size > bounds.right) | (y + size > bounds.bottom)
+        self._redirect(out)
+
+    def chase(self, flow_field, cell_size, target):
+        """追跡MOBの向きをフローフィールドに合わせる（flow_field.chase_direction の配列版）"""
+        idx = np.flatnonzero(self.hunter[:self.count])
+        if len(idx) == 0:
+            return
+        cs, size = cell_size, self.size
+        maze = flow_field.maze
+        flow = np.frombuffer(flow_field.flow, dtype=np.uint8).reshape(maze.rows, maze.cols)
+        x, y = self.x[idx], self.y[idx]
+        px, py = x + size // 2, y + size // 2
+        cx = np.clip(px // cs, 0, maze.cols - 1)
+        cy = np.clip(py // cs, 0, maze.rows - 1)
+        code = flow[cy, cx]
+
+        # 流れに沿う。曲がる時はまず今のセルの行（列）に収まるまで寄せる
+        follow = code < len(DIRECTIONS)
+        c = np.where(follow, code, 0)
+        fdx, fdy = _DIRS[c, 0], _DIRS[c, 1]
+        in_row = (y >= cy * cs) & (y + size <= (cy + 1) * cs)
+        in_col = (x >= cx * cs) & (x + size <= (cx + 1) * cs)
+        align_v = (fdx != 0) & ~in_row
+        align_h = (fdy != 0) & ~in_col
+        ndx = np.where(align_v, 0, np.where(align_h, np.where(px < cx * cs + cs // 2, 1, -1), fdx))
+        ndy = np.where(align_h, 0, np.where(align_v, np.where(py < cy * cs + cs // 2, 1, -1), fdy))
+
+        # プレイヤーと同じセルなら直接向かう
+        here = code == HERE
+        tx, ty = target[0] - px, target[1] - py
+        horizontal = np.abs(tx) >= np.abs(ty)
+        hdx = np.where(horizontal, np.sign(tx), 0)
+        hdy = np.where(horizontal, 0, np.sign(ty))
+        ndx = np.where(here, hdx, ndx)
+        ndy = np.where(here, hdy, ndy)
+
+        steer = follow | (here & ((hdx != 0) | (hdy != 0)))
+        self.dx[idx[steer]] = ndx[steer]
+        self.dy[idx[steer]] = ndy[steer]
+
+    def touching(self, rect):
+        """rect に重なっているMOBのビュー（番号の大きい順）"""
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        hit = (x < rect.right) & (x + self.size > rect.left) & (y < rect.bottom) & (y + self.size > rect.top)
+        return [MobView(self, int(i)) for i in np.flatnonzero(hit)[::-1]]
+
+    def remove(self, mob):
+        """末尾のMOBと入れ替えて消す（O(1)）"""
+        i, last = mob.index, self.count - 1
+        for arr in (self.x, self.y, self.prev_x, self.prev_y, self.dx, self.dy, self.speed, self.color, self.hunter):
+            arr[i] = arr[last]
+        self.count = last
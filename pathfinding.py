@@ -0,0 +1,187 @@
+from array import array
+from collections import deque
+
+from maze_gen import WALL
+
+
+class MazePaths:
+    """完全迷路（全域木）の最短経路をまとめて引けるようにしたもの
+
+    完全迷路では2セル間の道は1本しかないので、スタートを根にした木の
+    最小共通祖先（LCA）が分かれば距離も経路も決まる。通路の一本道（次数2の
+    セル）は縮めて、分かれ道と行き止まりだけの「分岐点の木」を作り、その上で
+    ダブリング（2^k 個上の祖先の表）を持つ。
+    距離は O(log n)、経路は長さに比例した時間で取り出せる。
+    セルはすべて y * cols + x の番号で扱う。
+    """
+
+    def __init__(self, maze, root=None):
+        self.maze = maze
+        cols, cells = maze.cols, maze.cells
+        size = maze.rows * cols
+        sx, sy = root if root is not None else maze.start
+        root = sy * cols + sx
+
+        # 木を幅優先でたどって、親・深さ・次数を求める
+        parent = array("i", [-1]) * size
+        depth = array("i", [-1]) * size
+        degree = bytearray(size)
+        order = []
+        depth[root] = 0
+        queue = deque([root])
+        edges = 0
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            x = i % cols
+            for n in (i - cols, i + cols, i - 1 if x > 0 else -1, i + 1 if x < cols - 1 else -1):
+                if 0 <= n < size and cells[n] != WALL:
+                    degree[i] += 1
+                    if depth[n] < 0:
+                        depth[n] = depth[i] + 1
+                        parent[n] = i
+                        edges += 1
+                        queue.append(n)
+                    elif n != parent[i]:
+                        raise ValueError("迷路に輪があります（完全迷路ではありません）")
+
+        # 分岐点（次数が2でないセルと根）ごとに番号を付ける
+        # anchor[i]: i 自身か、i より上で一番近い分岐点の番号
+        # top[i]:    i の上にある一番近い分岐点から i へ降りる一本道の最初のセル
+        anchor = array("i", [-1]) * size
+        top = array("i", [-1]) * size
+        junctions = array("i")  # 分岐点の番号 -> セル
+        jparent = array("i")  # 分岐点の木での親
+        jlevel = array("i")  # 分岐点の木での深さ
+        corridors = {}  # 一本道の最初のセル -> 上から順に並べた一本道のセル（下の分岐点は含まない）
+        for i in order:
+            p = parent[i]
+            if p >= 0:
+                top[i] = i if junctions[anchor[p]] == p else top[p]
+            if i == root or degree[i] != 2:
+                j = len(junctions)
+                junctions.append(i)
+                up = anchor[p] if p >= 0 else j
+                jparent.append(up)
+                jlevel.append(jlevel[up] + 1 if p >= 0 else 0)
+                anchor[i] = j
+            else:
+                anchor[i] = anchor[p]
+                corridors.setdefault(top[i], array("i")).append(i)
+
+        # ダブリング: jump[k][j] は分岐点 j の 2^k 個上の分岐点
+        jump = [jparent]
+        while (1 << len(jump)) < len(junctions):
+            prev = jump[-1]
+            jump.append(array("i", (prev[prev[j]] for j in range(len(junctions)))))
+
+        self.root = root
+        self.parent, self.depth, self.top, self.anchor = parent, depth, top, anchor
+        self.junctions, self.jlevel, self.jump = junctions, jlevel, jump
+        self.corridors = corridors
+
+    # --- 分岐点の木 ---
+
+    def _lift(self, j, level):
+        """分岐点 j から木の深さ level の祖先まで上がる"""
+        diff = self.jlevel[j] - level
+        k = 0
+        while diff:
+            if diff & 1:
+                j = self.jump[k][j]
+            diff >>= 1
+            k += 1
+        return j
+
+    def _junction_lca(self, a, b):
+        jlevel, jump = self.jlevel, self.jump
+        if jlevel[a] > jlevel[b]:
+            a = self._lift(a, jlevel[b])
+        elif jlevel[b] > jlevel[a]:
+            b = self._lift(b, jlevel[a])
+        if a == b:
+            return a
+        for table in reversed(jump):
+            if table[a] != table[b]:
+                a, b = table[a], table[b]
+        return jump[0][a]
+
+    def _below(self, cell, j, other):
+        """cell（上の分岐点が j）と、j より下の分岐点 other のどちらが上か
+
+        other へ降りる道の途中に cell があれば cell が祖先なので cell を、
+        そうでなければ j を返す。
+        """
+        if cell == self.junctions[j]:
+            return cell
+        child = self._lift(other, self.jlevel[j] + 1)
+        return cell if self.top[cell] == self.top[self.junctions[child]] else self.junctions[j]
+
+    # --- セル ---
+
+    def lca(self, a, b):
+        """セル a と b の最小共通祖先（スタートから見て道が分かれるセル）"""
+        anchor, depth, top = self.anchor, self.depth, self.top
+        ja, jb = anchor[a], anchor[b]
+        j = self._junction_lca(ja, jb)
+        if ja != j and jb != j:
+            return self.junctions[j]
+        if ja == j and jb != j:
+            return self._below(a, j, jb)
+        if jb == j and ja != j:
+            return self._below(b, j, ja)
+        # 同じ分岐点の下にいる
+        jcell = self.junctions[j]
+        if a == jcell or b == jcell or top[a] != top[b]:
+            return jcell
+        return a if depth[a] <= depth[b] else b
+
+    def distance(self, a, b):
+        """セル a から b までの歩数"""
+        depth = self.depth
+        return depth[a] + depth[b] - 2 * depth[self.lca(a, b)]
+
+    def ancestor(self, cell, d):
+        """cell の祖先のうち深さ d のセル"""
+        depth, anchor, top, junctions = self.depth, self.anchor, self.top, self.junctions
+        if d >= depth[cell]:
+            return cell
+        if junctions[anchor[cell]] != cell:
+            t = top[cell]
+            if d >= depth[t]:
+                return self.corridors[t][d - depth[t]]
+            cell = junctions[anchor[cell]]
+        # 深さ d 以上で一番上の分岐点まで上がる
+        j = anchor[cell]
+        for table in reversed(self.jump):
+            if depth[junctions[table[j]]] >= d:
+                j = table[j]
+        cell = junctions[j]
+        if depth[cell] == d:
+            return cell
+        t = top[cell]
+        return self.corridors[t][d - depth[t]]
+
+    def next_step(self, a, b):
+        """a から b へ向かう時に次に進むセル（a == b なら None）"""
+        if a == b:
+            return None
+        if self.lca(a, b) != a:
+            return self.parent[a]
+        return self.ancestor(b, self.depth[a] + 1)
+
+    def path(self, a, b):
+        """a から b までのセルのリスト（両端を含む）"""
+        parent = self.parent
+        c = self.lca(a, b)
+        up = []
+        while a != c:
+            up.append(a)
+            a = parent[a]
+        down = []
+        while b != c:
+            down.append(b)
+            b = parent[b]
+        up.append(c)
+        up.extend(reversed(down))
+        return up
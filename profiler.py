@@ -0,0 +1,110 @@
+import json
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from time import perf_counter_ns
+
+
+class NullProfiler:
+    """計測しない時に使う何もしないプロファイラ"""
+
+    show_overlay = False
+
+    def phase(self, name):
+        return nullcontext()
+
+    def end_frame(self):
+        pass
+
+    def draw_overlay(self, screen, font, pos=None):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class FrameProfiler:
+    """1フレームをフェーズ（入力・当たり判定・描画…）ごとに計測する
+
+    直近 history フレーム分から p50/p95/p99 を出して画面に重ねて表示できる。
+    計測した区間は Chrome のトレース形式（chrome://tracing や Perfetto で開ける）
+    で書き出せる。
+    """
+
+    def __init__(self, history=600, trace_events=100000, refresh=30):
+        self.history = history
+        self.samples = {}  # フェーズ名 -> 直近の所要時間(ms)
+        self.frame_ms = deque(maxlen=history)
+        self.trace = deque(maxlen=trace_events)  # (名前, 開始ns, 長さns)
+        self.refresh = refresh  # オーバーレイの数値を更新する間隔（フレーム）
+        self.show_overlay = False
+        self._current = {}
+        self._frame_start = perf_counter_ns()
+        self._frames = 0
+        self._overlay = []  # 描画済みの行（refresh フレームごとに作り直す）
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            took = perf_counter_ns() - start
+            self._current[name] = self._current.get(name, 0) + took
+            self.trace.append((name, start, took))
+
+    def end_frame(self):
+        """フレームの終わりに呼ぶ。このフレームの各フェーズの時間を記録する"""
+        now = perf_counter_ns()
+        took = now - self._frame_start
+        self.frame_ms.append(took / 1e6)
+        self.trace.append(("frame", self._frame_start, took))
+        for name, ns in self._current.items():
+            bucket = self.samples.get(name)
+            if bucket is None:
+                bucket = self.samples[name] = deque(maxlen=self.history)
+            bucket.append(ns / 1e6)
+        self._current.clear()
+        self._frame_start = now
+        self._frames += 1
+
+    def percentiles(self, values, points=(50, 95, 99)):
+        ordered = sorted(values)
+        if not ordered:
+            return tuple(0.0 for _ in points)
+        return tuple(ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in points)
+
+    def fps(self):
+        if not self.frame_ms:
+            return 0.0
+        return 1000.0 * len(self.frame_ms) / sum(self.frame_ms)
+
+    def report(self):
+        """フェーズごとの (p50, p95, p99)[ms] の辞書"""
+        stats = {name: self.percentiles(values) for name, values in self.samples.items()}
+        stats["frame"] = self.percentiles(self.frame_ms)
+        return stats
+
+    def draw_overlay(self, screen, font, pos=(10, 130)):
+        """計測結果を画面に重ねて表示する（show_overlay が True の時だけ）"""
+        if not self.show_overlay:
+            return
+        if not self._overlay or self._frames % self.refresh == 0:
+            lines = [f"FPS {self.fps():5.1f}   p50 / p95 / p99 ms"]
+            for name, (p50, p95, p99) in self.report().items():
+                lines.append(f"{name:<10} {p50:6.2f} {p95:6.2f} {p99:6.2f}")
+            self._overlay = [font.render(line, True, (255, 255, 255), (0, 0, 0)) for line in lines]
+        x, y = pos
+        for surface in self._overlay:
+            screen.blit(surface, (x, y))
+            y += surface.get_height()
+
+    def dump_trace(self, path):
+        """記録した区間を Chrome トレース形式の JSON に書き出す"""
+        events = [
+            {"name": name, "ph": "X", "ts": start / 1000, "dur": took / 1000, "pid": 0,
+             "tid": 0 if name == "frame" else 1}
+            for name, start, took in self.trace
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
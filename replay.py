@@ -0,0 +1,149 @@
+"""入力の記録と、画面なしの高速リプレイ
+
+ゲームは「シードと GameState の引数」と「ティックごとの入力ビットマスク」
+だけで決まるので、それを記録しておけば同じプレイを何度でも再現できる。
+入力は1ティック1バイトで持ち、保存する時に zlib で縮める（同じキーを押し
+続けている間はほとんど場所を取らない）。
+
+    python replay.py last_session.rpl               # 全ての面を再生して結果を確かめる
+    python replay.py last_session.rpl --seek 5000   # 5000ティック目の状態を出す
+"""
+import argparse
+import json
+import pickle
+import struct
+import time
+import zlib
+
+from game_state import GameState
+
+MAGIC = b"KRPL"
+VERSION = 1
+CHECKPOINT_INTERVAL = 600  # この間隔（ティック）で状態を覚えておき、シークはそこから再生する
+
+_HEADER = struct.Struct("<4sHI")  # magic, version, JSON の長さ
+
+
+def make_state(params):
+    """記録した引数からゲームを作る"""
+    params = dict(params)
+    if params.pop("mode", None) == "endless":
+        from infinite_maze import EndlessState
+        return EndlessState(**params)
+    if params.get("active_size") is not None:
+        params["active_size"] = tuple(params["active_size"])
+    return GameState(**params)
+
+
+class Recording:
+    """1セッション分の記録（面ごとに、引数・入力・結果）"""
+
+    def __init__(self):
+        self.levels = []  # {"params": dict, "inputs": bytearray, "result": str or None}
+        self._current = None  # 記録中の面（None なら記録しない）
+
+    def start_level(self, params):
+        self._current = {"params": dict(params), "inputs": bytearray(), "result": None}
+        self.levels.append(self._current)
+
+    def record(self, inputs):
+        """1ティック分の入力を足す"""
+        if self._current is not None:
+            self._current["inputs"].append(inputs)
+
+    def end_level(self, result):
+        if self._current is not None:
+            self._current["result"] = result
+        self._current = None
+
+    def save(self, path):
+        blobs = [zlib.compress(bytes(level["inputs"]), 9) for level in self.levels]
+        header = json.dumps({"levels": [
+            {"params": level["params"], "ticks": len(level["inputs"]), "result": level["result"], "size": len(blob)}
+            for level, blob in zip(self.levels, blobs)
+        ]}).encode()
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, length = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("リプレイデータではありません")
+        offset = _HEADER.size
+        header = json.loads(data[offset:offset + length])
+        offset += length
+        recording = cls()
+        for level in header["levels"]:
+            inputs = bytearray(zlib.decompress(data[offset:offset + level["size"]]))
+            offset += level["size"]
+            recording.levels.append({"params": level["params"], "inputs": inputs, "result": level["result"]})
+        return recording
+
+
+class ReplayPlayer:
+    """1面分の入力を画面なしで再生する
+
+    再生しながら CHECKPOINT_INTERVAL ティックごとに状態を pickle して覚えて
+    おくので、seek() は一番近いチェックポイントから先だけを再生すればよい。
+    """
+
+    def __init__(self, params, inputs, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.params = params
+        self.inputs = inputs
+        self.checkpoint_interval = checkpoint_interval
+        self.state = make_state(params)
+        self.checkpoints = {0: pickle.dumps(self.state)}  # ティック -> 状態
+
+    def run(self, until=None):
+        """until ティック目（省略時は最後）まで進める。終わった state を返す"""
+        state, inputs, interval = self.state, self.inputs, self.checkpoint_interval
+        end = len(inputs) if until is None else min(until, len(inputs))
+        while state.tick < end and state.result is None:
+            if state.tick % interval == 0 and state.tick not in self.checkpoints:
+                self.checkpoints[state.tick] = pickle.dumps(state)
+            state.step(inputs[state.tick])
+        return state
+
+    def seek(self, tick):
+        """tick ティック目の状態にする（前にも後ろにも動ける）"""
+        start = max(t for t in self.checkpoints if t <= tick)
+        if not start <= self.state.tick <= tick:
+            self.state = pickle.loads(self.checkpoints[start])
+        return self.run(tick)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="記録したプレイを画面なしで再生する")
+    parser.add_argument("path")
+    parser.add_argument("--level", type=int, default=None, help="この面だけ再生する（1から）")
+    parser.add_argument("--seek", type=int, default=None, help="このティックの状態を表示する")
+    args = parser.parse_args(argv)
+
+    recording = Recording.load(args.path)
+    mismatches = 0
+    for number, level in enumerate(recording.levels, 1):
+        if args.level is not None and number != args.level:
+            continue
+        player = ReplayPlayer(level["params"], level["inputs"])
+        start = time.perf_counter()
+        state = player.run()
+        took = time.perf_counter() - start
+        ok = level["result"] is None or state.result == level["result"]
+        mismatches += not ok
+        print(f"level {number}: {state.tick} ticks in {took:.2f}s ({state.tick / max(took, 1e-9):,.0f} ticks/s) "
+              f"result={state.result} recorded={level['result']}{'' if ok else '  MISMATCH'}")
+        if args.seek is not None:
+            state = player.seek(args.seek)
+            print(f"  tick {state.tick}: player=({state.player_x}, {state.player_y}) hp={state.player_health} "
+                  f"mobs={len(state.mobs)} items={len(state.items)}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,287 @@
+"""迷路とゲームの状態をコンパクトなバイナリで保存・読み込みする
+
+迷路ファイル:   ヘッダ + セル（1セル1バイト） + スタートからの歩数（int32）
+セーブファイル: ヘッダ + 迷路と同じ並び + タイルマップ + アイテム・MOB の固定長レコード
+                + 乱数の状態
+
+どちらも mmap で開き、迷路のセルはファイルの中身をコピーせずにそのまま使う
+ので、巨大な迷路でもすぐに開ける。読み込んだ迷路はファイルを参照し続けるので、
+保存は一時ファイルに書いてから置き換える（開いているファイルを切り詰めない）。
+置き換える前に、そのファイルから読み込んだ迷路のセルはメモリにコピーして
+mmap を手放す（Windows は mmap 中のファイルを置き換えられない）。
+数値はすべてリトルエンディアン。
+
+    python savegame.py   # 保存 → 読み込み → 同じファイルに保存 で中身が変わらないか確かめる
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import weakref
+from array import array
+from contextlib import contextmanager
+
+from entities import EntityList
+from flow_field import FlowField
+from game_state import HUNTER_RADIUS, ITEM_TYPES, MOB_COLORS, GameState, Item, Mob
+from maze_gen import Maze
+from tile_map import TileMap
+
+MAZE_MAGIC = b"KMAZ"
+SAVE_MAGIC = b"KSAV"
+VERSION = 1
+SAVE_VERSION = 2  # 2: 更新する範囲と MOB の前のティックの位置を足した
+
+# magic, version, 予備, rows, cols, start x/y, goal x/y（32バイト）
+_MAZE = struct.Struct("<4sHHiiiiii")
+
+# GameState から保存する整数（bool も 0/1 で入れる）
+_GAME_FIELDS = (
+    "cell_size", "tick", "player_x", "player_y", "player_size", "player_speed", "player_health",
+    "invincible", "invincible_ticks", "weapon_active", "weapon_timer", "invincible_item",
+    "invincible_timer", "damage_taken", "vectorized_mobs",
+)
+_BOOL_FIELDS = {"invincible", "weapon_active", "invincible_item", "vectorized_mobs"}
+# magic, version, 予備, フィールド, 結果, アイテム数, MOB数, MOBの大きさ, 更新する範囲の幅・高さ（0 なら全体）
+_GAME = struct.Struct("<4sHH" + "i" * len(_GAME_FIELDS) + "iiiiii")
+_RESULTS = [None, "clear", "over"]
+
+_ITEM = struct.Struct("<iii")  # x, y, 種類
+_MOB = struct.Struct("<iiiiiiiii")  # x, y, dx, dy, 速さ, 色, 追跡MOBか, 前のティックの x, y
+_RNG = struct.Struct("<625IB7xd")  # random.Random の内部状態
+_LENGTH = struct.Struct("<I")
+
+
+def _pad(offset):
+    return -offset % 4
+
+
+# --- 迷路 ---
+
+def _write_maze(f, maze):
+    f.write(_MAZE.pack(MAZE_MAGIC, VERSION, 0, maze.rows, maze.cols, *maze.start, *maze.goal))
+    f.write(maze.cells)
+    f.write(bytes(_pad(len(maze.cells))))
+    f.write(maze.dist.tobytes())
+
+
+def _read_maze(buf, offset):
+    """buf の offset から迷路を読む。(maze, 次の offset) を返す"""
+    magic, version, _, rows, cols, sx, sy, gx, gy = _MAZE.unpack_from(buf, offset)
+    if magic != MAZE_MAGIC or version != VERSION:
+        raise ValueError("迷路データではありません")
+    offset += _MAZE.size
+    n = rows * cols
+    maze = Maze(rows, cols, buf[offset:offset + n])  # コピーしない
+    offset += n + _pad(n)
+    maze.dist = array("i")
+    maze.dist.frombytes(buf[offset:offset + 4 * n])
+    maze.start, maze.goal = (sx, sy), (gx, gy)
+    return maze, offset + 4 * n
+
+
+# ファイルごとの、そのファイルを mmap したまま使っている迷路
+_mapped = {}
+
+
+def _keep_mapped(path, maze):
+    _mapped.setdefault(os.path.abspath(path), weakref.WeakSet()).add(maze)
+
+
+def _detach(path):
+    """path から読み込んだ迷路のセルをメモリにコピーする（mmap への参照がなくなり閉じられる）"""
+    for maze in _mapped.pop(os.path.abspath(path), ()):
+        maze.__setstate__(maze.__getstate__())
+
+
+@contextmanager
+def _replacing(path):
+    """path + ".tmp" に書いて、書き終わったら path と置き換える
+
+    load_maze() / load_game() の迷路は元のファイルを mmap したままなので、
+    同じファイルに直接書くと切り詰めた時点で読めなくなる（SIGBUS）。
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        yield f
+    _detach(path)
+    os.replace(tmp, path)
+
+
+def _open(path):
+    """ファイルを mmap する（書き換えてもファイルには戻らない）"""
+    with open(path, "rb") as f:
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+
+
+def save_maze(maze, path):
+    with _replacing(path) as f:
+        _write_maze(f, maze)
+
+
+def load_maze(path):
+    maze, _ = _read_maze(_open(path), 0)
+    _keep_mapped(path, maze)
+    return maze
+
+
+# --- ゲームの状態 ---
+
+def _mob_records(state):
+    """MOBを (x, y, dx, dy, 速さ, 色, 追跡MOBか, 前の x, 前の y) のタプルにする"""
+    if state.vectorized_mobs:
+        s, n = state.mobs, len(state.mobs)
+        return zip(s.x[:n].tolist(), s.y[:n].tolist(), s.dx[:n].tolist(), s.dy[:n].tolist(),
+                   s.speed[:n].tolist(), s.color[:n].tolist(), s.hunter[:n].tolist(),
+                   s.prev_x[:n].tolist(), s.prev_y[:n].tolist())
+    return ((m.rect.x, m.rect.y, *m.direction, m.speed, MOB_COLORS.index(m.color), m.hunter, *m.prev)
+            for m in state.mobs)
+
+
+def save_game(state, path):
+    """ゲームの状態をまるごと保存する"""
+    if state.goal is None:
+        raise ValueError("果てのない迷路は保存できません")
+    mob_size = state.cell_size // 3
+    active_size = state.active_size or (0, 0)
+    with _replacing(path) as f:
+        f.write(_GAME.pack(SAVE_MAGIC, SAVE_VERSION, 0, *(int(getattr(state, name)) for name in _GAME_FIELDS),
+                           _RESULTS.index(state.result), len(state.items), len(state.mobs), mob_size,
+                           *active_size))
+        _write_maze(f, state.maze)
+        tiles = state.tiles.tiles
+        f.write(tiles)
+        f.write(bytes(_pad(len(tiles))))
+        for item in state.items:
+            f.write(_ITEM.pack(item.rect.x, item.rect.y, ITEM_TYPES.index(item.type)))
+        for record in _mob_records(state):
+            f.write(_MOB.pack(*record))
+        _, internal, gauss = state.rng.getstate()
+        f.write(_RNG.pack(*internal, gauss is not None, gauss or 0.0))
+        extra = b""
+        if state.vectorized_mobs:
+            extra = json.dumps(state.mobs.rng.bit_generator.state).encode()
+        f.write(_LENGTH.pack(len(extra)))
+        f.write(extra)
+
+
+def load_game(path):
+    """save_game() で保存したファイルから GameState を作り直す"""
+    buf = _open(path)
+    header = _GAME.unpack_from(buf, 0)
+    magic, version = header[:2]
+    if magic != SAVE_MAGIC or version != SAVE_VERSION:
+        raise ValueError("セーブデータではありません")
+    fields = dict(zip(_GAME_FIELDS, header[3:3 + len(_GAME_FIELDS)]))
+    result, num_items, num_mobs, mob_size, active_w, active_h = header[3 + len(_GAME_FIELDS):]
+
+    maze, offset = _read_maze(buf, _GAME.size)
+    _keep_mapped(path, maze)
+    n = maze.rows * maze.cols
+    cs = fields["cell_size"]
+    tiles = TileMap(maze.rows, maze.cols, cs, bytearray(buf[offset:offset + n]))
+    offset += n + _pad(n)
+
+    vectorized = bool(fields["vectorized_mobs"])
+    state = GameState(maze.rows, maze.cols, cs, maze=maze, tiles=tiles, num_items=0, num_mobs=0,
+                      player_speed=fields["player_speed"], vectorized_mobs=vectorized,
+                      active_size=(active_w, active_h) if active_w else None)
+    for name, value in fields.items():
+        setattr(state, name, bool(value) if name in _BOOL_FIELDS else value)
+    state.prev_player = (state.player_x, state.player_y)
+    state.result = _RESULTS[result]
+
+    for _ in range(num_items):
+        x, y, kind = _ITEM.unpack_from(buf, offset)
+        offset += _ITEM.size
+        item = Item(x, y, ITEM_TYPES[kind], cs)
+        state.items.append(item)
+        state.collider.add_item(item)
+
+    records = [_MOB.unpack_from(buf, offset + i * _MOB.size) for i in range(num_mobs)]
+    offset += num_mobs * _MOB.size
+    if vectorized:
+        from mob_swarm import MobSwarm
+        columns = list(zip(*records)) or [()] * 9
+        swarm = MobSwarm(columns[0], columns[1], 0, mob_size)
+        for name, values in zip(("dx", "dy", "speed", "color", "hunter", "prev_x", "prev_y"), columns[2:]):
+            getattr(swarm, name)[:] = values
+        state.mobs = swarm
+    else:
+        state.mobs = EntityList()
+        for x, y, dx, dy, speed, color, hunter, prev_x, prev_y in records:
+            mob = Mob(x, y, speed, mob_size, state.rng, hunter=bool(hunter))
+            mob.direction = (dx, dy)
+            mob.color = MOB_COLORS[color]
+            mob.prev = (prev_x, prev_y)
+            state.mobs.append(mob)
+    if any(r[6] for r in records):
+        state.flow_field = FlowField(maze, HUNTER_RADIUS)
+
+    *internal, has_gauss, gauss = _RNG.unpack_from(buf, offset)
+    offset += _RNG.size
+    state.rng.setstate((3, tuple(internal), gauss if has_gauss else None))
+    (length,) = _LENGTH.unpack_from(buf, offset)
+    offset += _LENGTH.size
+    if length:
+        state.mobs.rng.bit_generator.state = json.loads(bytes(buf[offset:offset + length]))
+    return state
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def check_roundtrip(state, path, inputs=()):
+    """state を保存して読み込み、同じファイルに保存し直しても中身が変わらないか
+
+    inputs を渡すと、元の state と読み込んだ state の両方をその入力で進めて、
+    同じ状態になるかも確かめる。
+    """
+    save_game(state, path)
+    first = _read(path)
+    loaded = load_game(path)
+    save_game(loaded, path)  # 読み込んだ迷路が mmap しているファイルに上書きする
+    second = _read(path)
+    for step in inputs:
+        state.step(step)
+        loaded.step(step)
+    save_game(state, path)
+    third = _read(path)
+    save_game(loaded, path)
+    maze_path = path + ".maze"
+    save_maze(state.maze, maze_path)
+    save_maze(load_maze(maze_path), maze_path)
+    return first == second and third == _read(path) and load_maze(maze_path).cells == state.maze.cells
+
+
+def main():
+    from game_state import DOWN, RIGHT
+    cases = {
+        "mobs": {},
+        "hunters": {"hunter_ratio": 0.5},
+        "active_size": {"num_mobs": 30, "active_size": (300, 300)},  # 画面外のMOBを間引く
+    }
+    try:
+        import numpy  # noqa: F401
+        cases["vectorized"] = {"vectorized_mobs": True, "hunter_ratio": 0.5}
+    except ImportError:
+        pass
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for name, params in cases.items():
+            state = GameState(15, 20, 50, seed=1, **params)
+            inputs = [RIGHT if tick % 2 else DOWN for tick in range(240)]
+            for step in inputs[:120]:
+                state.step(step)
+            ok = check_roundtrip(state, os.path.join(directory, f"{name}.sav"), inputs[120:])
+            failed += not ok
+            print(f"{name}: {'ok' if ok else 'MISMATCH'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
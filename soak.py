@@ -0,0 +1,189 @@
+"""ボットに遊ばせ続ける耐久・負荷テスト（画面なし、複数セッションを並列）
+
+SolverBot に面を解かせ続け、1ティックにかかる時間（--render なら描画込みの
+1フレーム）と、プロセスのメモリ（RSS）の増え方を SAMPLE_TICKS ごとに記録する。
+長く回してもフレーム時間やメモリが増え続けないことを確かめる。
+
+    python soak.py --sessions 4 --ticks 216000             # 4セッションをそれぞれゲーム時間で1時間
+    python soak.py --sessions 2 --ticks 36000 --render     # dummy ドライバで描画も含めて計る
+    python soak.py --max-growth 50                         # RSS が 50MB 以上増えたら終了コード 1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from bot import SolverBot
+from game_state import TICK_RATE
+from levels import level_params
+from profiler import NULL_PROFILER
+from replay import make_state
+
+# kokaton2.py と同じ盤面
+ROWS, COLS, CELL_SIZE = 15, 20, 50
+ACTIVE_SIZE = (1024, 768)  # 画面の大きさ（これより外のMOBは間引いて動かす）
+
+SAMPLE_TICKS = 60 * TICK_RATE  # この間隔（ゲーム時間で1分）でフレーム時間とメモリを記録する
+LEVEL_TICK_LIMIT = 5 * 60 * TICK_RATE  # 1面でこれより長くかかったらあきらめて次のゲームへ
+
+
+def memory_kb():
+    """今のプロセスの RSS（KB）。/proc がない環境ではピークの値で代わりにする"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS はバイト単位
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, len(ordered) * p // 100)] if ordered else 0.0
+
+
+class Renderer:
+    """kokaton2 の描画を dummy ドライバの画面に行う（--render の時だけ作る）"""
+
+    def __init__(self, cell_size):
+        import pygame
+        import kokaton2
+        pygame.init()
+        kokaton2.SCREEN = pygame.display.set_mode((kokaton2.WIDTH, kokaton2.HEIGHT))
+        kokaton2.load_images(cell_size // 2)
+        self.game = kokaton2
+        self.camera = None
+
+    def start(self, state):
+        self.game.build_static_layer(state)
+        self.camera = self.game.make_camera(state)
+
+    def draw(self, state):
+        self.game.draw_game(state, self.camera, NULL_PROFILER)
+
+
+def run_session(task):
+    """1セッションを ticks ティック回して記録を返す（ワーカープロセスで実行される）"""
+    session, ticks, base, max_level, render = task
+    renderer = Renderer(base["cell_size"]) if render else None
+    bot = SolverBot()
+    samples, frame_ms = [], []
+    counts = {"clear": 0, "over": 0, "stuck": 0}
+    total = game = 0
+    level, state = 0, None
+    start = time.perf_counter()
+    while total < ticks:
+        if state is None or state.result is not None or state.tick >= LEVEL_TICK_LIMIT:
+            if state is not None:
+                counts[state.result or "stuck"] += 1
+            if state is None or state.result != "clear" or level >= max_level:
+                # 1面目から新しいシードでやり直す（面が広がり続けないように max_level で戻る）
+                level, game = 1, game + 1
+                params = dict(base, seed=base["seed"] + session * 1000003 + game * 101)
+            else:
+                level += 1
+            state = make_state(level_params(params, level))
+            if renderer is not None:
+                renderer.start(state)
+        inputs = bot(state)
+        # 計るのはゲームが1フレームにすること（ボットが考える時間は入れない）
+        t0 = time.perf_counter_ns()
+        state.step(inputs)
+        if renderer is not None:
+            renderer.draw(state)
+        frame_ms.append((time.perf_counter_ns() - t0) / 1e6)
+        total += 1
+        if total % SAMPLE_TICKS == 0:
+            frame_ms.sort()
+            samples.append({
+                "tick": total,
+                "level": level,
+                "p50_ms": percentile(frame_ms, 50),
+                "p99_ms": percentile(frame_ms, 99),
+                "max_ms": frame_ms[-1],
+                "rss_kb": memory_kb(),
+            })
+            frame_ms.clear()
+    return {
+        "session": session,
+        "ticks": total,
+        "seconds": time.perf_counter() - start,
+        "games": game,
+        **counts,
+        "samples": samples,
+    }
+
+
+def summarize(result):
+    """1セッションのフレーム時間とメモリの増え方をまとめる"""
+    samples = result["samples"]
+    p50 = sorted(s["p50_ms"] for s in samples)
+    rss = [s["rss_kb"] for s in samples if s["rss_kb"] is not None]
+    # 最初のサンプルまでは作りかけのキャッシュなどで増えるので、そこからの増え方を見る
+    growth = rss[-1] - rss[0] if len(rss) >= 2 else None
+    return {
+        "ticks_per_s": result["ticks"] / max(result["seconds"], 1e-9),
+        "p50_ms": percentile(p50, 50),
+        "p99_ms": max((s["p99_ms"] for s in samples), default=0.0),
+        "max_ms": max((s["max_ms"] for s in samples), default=0.0),
+        "rss_start_kb": rss[0] if rss else None,
+        "rss_growth_kb": growth,
+    }
+
+
+def soak(sessions, ticks, base, max_level=3, render=False, workers=None):
+    tasks = [(session, ticks, base, max_level, render) for session in range(sessions)]
+    with ProcessPoolExecutor(max_workers=workers or min(sessions, os.cpu_count())) as pool:
+        return list(pool.map(run_session, tasks))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ボットによる耐久・負荷テスト")
+    parser.add_argument("--sessions", type=int, default=os.cpu_count(), help="並列に回すセッション数")
+    parser.add_argument("--ticks", type=int, default=60 * SAMPLE_TICKS, help="1セッションのティック数")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時はセッション数かCPU数）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-level", type=int, default=3, help="この面をクリアしたら1面目に戻る")
+    parser.add_argument("--num-mobs", type=int, default=10)
+    parser.add_argument("--hunter-ratio", type=float, default=0.0)
+    parser.add_argument("--vectorized", action="store_true", help="MOBを NumPy でまとめて動かす")
+    parser.add_argument("--render", action="store_true", help="dummy ドライバで描画まで行って計る")
+    parser.add_argument("--out", default=None, help="サンプルを全部 JSON で書き出す")
+    parser.add_argument("--max-growth", type=float, default=None, help="RSS がこれ（MB）以上増えたら終了コード 1")
+    args = parser.parse_args(argv)
+    if args.out:
+        args.out = os.path.abspath(args.out)  # --render で kokaton2 を読むと作業ディレクトリが変わる
+
+    base = dict(rows=ROWS, cols=COLS, cell_size=CELL_SIZE, seed=args.seed, num_mobs=args.num_mobs,
+                hunter_ratio=args.hunter_ratio, vectorized_mobs=args.vectorized, active_size=ACTIVE_SIZE)
+    results = soak(args.sessions, args.ticks, base, args.max_level, args.render, args.workers)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    for result in results:
+        summary = summarize(result)
+        growth = summary["rss_growth_kb"]
+        print(f"session {result['session']}: {result['ticks']} ticks ({summary['ticks_per_s']:,.0f}/s) "
+              f"games={result['games']} clear={result['clear']} over={result['over']} stuck={result['stuck']}  "
+              f"frame p50={summary['p50_ms']:.3f}ms p99={summary['p99_ms']:.3f}ms max={summary['max_ms']:.3f}ms  "
+              f"rss={summary['rss_start_kb']}KB growth={'n/a' if growth is None else f'{growth:+d}KB'}")
+        if args.max_growth is not None and growth is not None and growth > args.max_growth * 1024:
+            failed = True
+    if failed:
+        print(f"RSS が {args.max_growth}MB 以上増えたセッションがあります")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+from maze_gen import GOAL, WALL
+
+# 1セル1バイトのビットフラグ
+TILE_WALL = 1
+TILE_DAMAGE = 2
+TILE_GOAL = 4
+TILE_ITEM = 8
+TILE_VISITED = 16
+
+_FROM_MAZE = bytes(TILE_WALL if i == WALL else TILE_GOAL if i == GOAL else 0 for i in range(256))
+
+
+class TileMap:
+    """迷路の状態を1セル1バイトのビットフラグで持つタイルマップ
+
+    壁・ダメージ壁・ゴール・アイテム・訪問済みを1本の bytearray で表す。
+    セルごとの pygame.Rect は持たない。当たり判定と描画はここを見る。
+    壁の並びは作った迷路の maze.cells にも残っていて、経路を探すもの
+    （FlowField・MazePaths・FreeCellIndex・SolverBot）はそちらを読む。
+    遊んでいる間に壁は変わらないので、2つは食い違わない。
+    ダメージ壁・アイテム・訪問済みはタイルマップにしかない。
+    """
+
+    def __init__(self, rows, cols, cell_size, tiles=None):
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = cell_size
+        self.tiles = bytearray(rows * cols) if tiles is None else tiles
+
+    @classmethod
+    def from_maze(cls, maze, cell_size, damage_cells=()):
+        """迷路から作る。damage_cells はダメージ壁にするセル番号"""
+        tile_map = cls(maze.rows, maze.cols, cell_size, bytearray(maze.cells).translate(_FROM_MAZE))
+        for i in damage_cells:
+            tile_map.tiles[i] |= TILE_DAMAGE
+        return tile_map
+
+    def set(self, index, flag):
+        self.tiles[index] |= flag
+
+    def clear(self, index, flag):
+        self.tiles[index] &= ~flag & 0xFF
@@ -0,0 +1,41 @@
+import time
+
+
+class FixedTimestep:
+    """シミュレーションを一定の間隔（tick_rate 回/秒）で進めるためのアキュムレータ
+
+    描画のフレームが遅れても、経過時間の分だけティックをまとめて進めるので
+    ゲームの速さは変わらない。描画側は alpha（次のティックまでの割合）で
+    前後のティックの位置を補間する。時間はすべて単調増加の時計で測る。
+    """
+
+    def __init__(self, tick_rate, max_steps=5, clock=time.perf_counter):
+        self.dt = 1.0 / tick_rate
+        self.max_steps = max_steps  # 1フレームで進める上限（重い時に止まらないように）
+        self.clock = clock
+        self.accumulator = 0.0
+        self._last = clock()
+
+    def advance(self):
+        """前回からの経過時間を足し込み、今進めるべきティック数を返す"""
+        now = self.clock()
+        self.accumulator += now - self._last
+        self._last = now
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            # 追いつけない分は捨てる（ゲームが少し遅くなるだけで固まらない）
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        """直前のティックから次のティックまでのどこにいるか（0.0〜1.0）"""
+        return min(1.0, self.accumulator / self.dt)
+
+
+def lerp_pos(prev, cur, alpha):
+    """2つの位置の間を alpha で補間する"""
+    return (round(prev[0] + (cur[0] - prev[0]) * alpha), round(prev[1] + (cur[1] - prev[1]) * alpha))